@@ -0,0 +1,243 @@
+import re
+import time
+import asyncio
+import logging
+import datetime
+from telegram.error import BadRequest, RetryAfter, TimedOut, NetworkError
+
+logger = logging.getLogger("ronaldinho-delivery")
+
+MAX_LENGTH = 4000 # Telegram hard limit is 4096
+FENCE = re.compile(r"^\s*```")
+
+def _split_line(line: str, limit: int) -> list:
+    """Cuts an over-long line at the last space before the limit (hard cut if there is none)."""
+    pieces = []
+    while len(line) > limit:
+        cut = line.rfind(" ", 0, limit)
+        cut = cut if cut > limit // 2 else limit
+        pieces.append(line[:cut])
+        line = line[cut:].lstrip(" ")
+    pieces.append(line)
+    return pieces
+
+def _blocks(text: str) -> list:
+    """Paragraphs and whole ``` fenced blocks, in order: the units a chunk may never cut through."""
+    blocks, current, fenced = [], [], False
+    for line in text.split("\n"):
+        if FENCE.match(line):
+            if not fenced and current:
+                blocks.append("\n".join(current))
+                current = []
+            current.append(line)
+            fenced = not fenced
+            if not fenced:
+                blocks.append("\n".join(current))
+                current = []
+            continue
+        if not fenced and not line.strip():
+            if current:
+                blocks.append("\n".join(current))
+                current = []
+            continue
+        current.append(line)
+    if current:
+        blocks.append("\n".join(current))
+    return blocks
+
+def _split_block(block: str, limit: int) -> list:
+    """Splits one oversized block by lines; code blocks are closed and reopened around each cut."""
+    lines = block.split("\n")
+    opener = lines[0].strip() if FENCE.match(lines[0]) else None
+    if opener:
+        lines = lines[1:-1] if len(lines) > 1 and FENCE.match(lines[-1]) else lines[1:]
+        limit -= len(opener) + len("\n\n```")
+    pieces, current = [], ""
+    for line in lines:
+        for part in _split_line(line, limit):
+            candidate = f"{current}\n{part}" if current else part
+            if len(candidate) > limit and current:
+                pieces.append(current)
+                candidate = part
+            current = candidate
+    if current or not pieces:
+        pieces.append(current)
+    return [f"{opener}\n{p}\n```" for p in pieces] if opener else pieces
+
+def split_markdown(text: str, limit: int = MAX_LENGTH) -> list:
+    """Packs paragraphs and code blocks into chunks of at most `limit` characters, cutting only between them."""
+    chunks, current = [], ""
+    for block in _blocks(text):
+        for piece in ([block] if len(block) <= limit else _split_block(block, limit)):
+            candidate = f"{current}\n\n{piece}" if current else piece
+            if len(candidate) > limit and current:
+                chunks.append(current)
+                candidate = piece
+            current = candidate
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+def is_valid_markdown(chunk: str) -> bool:
+    """
+    Conservative check of Telegram's legacy Markdown: code spans and fences closed, then
+    balanced * and _ and a closing ] for every [ outside code. False means "send as plain text".
+    """
+    if chunk.count("```") % 2:
+        return False
+    outside = re.sub(r"```.*?```", "", chunk, flags=re.DOTALL)
+    if outside.count("`") % 2:
+        return False
+    outside = re.sub(r"`[^`]*`", "", outside)
+    outside = re.sub(r"\\[*_\[`]", "", outside)
+    if outside.count("*") % 2 or outside.count("_") % 2:
+        return False
+    depth = 0
+    for char in outside:
+        if char == "[":
+            depth += 1
+        elif char == "]" and depth:
+            depth -= 1
+    return depth == 0
+
+class TokenBucket:
+    """`rate` sends per second with bursts up to `capacity`; block_for() honors a server-imposed pause."""
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def block_for(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+class DeliveryScheduler:
+    """
+    Outbound Telegram queue. Each chat gets its own FIFO worker (so chunks stay in order)
+    while different chats send concurrently; every send takes a token from the chat's bucket
+    (1/s, 20/min for groups) and the global one (30/s), and RetryAfter pauses the chat's bucket,
+    plus the global one when the global bucket was drained at the time.
+    """
+    def __init__(self, bot, global_rate: float = 30.0, chat_rate: float = 1.0, group_rate: float = 20 / 60,
+                 max_attempts: int = 4, idle_seconds: float = 60.0):
+        self.bot = bot
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.max_attempts = max_attempts
+        self.idle_seconds = idle_seconds
+        self.buckets = {}
+        self.queues = {}
+        self.workers = {}
+        self.metrics = {"chunks": 0, "plain_fallbacks": 0, "retry_after": 0, "failed": 0}
+
+    def _bucket(self, chat_id: str) -> TokenBucket:
+        bucket = self.buckets.get(chat_id)
+        if bucket is None:
+            # Group and channel ids are negative
+            rate = self.group_rate if str(chat_id).startswith("-") else self.chat_rate
+            bucket = self.buckets[chat_id] = TokenBucket(rate, 3)
+        return bucket
+
+    async def deliver(self, chat_id, text: str, parse_mode: str = "Markdown"):
+        """Queues `text` for the chat and waits until every chunk has been sent (or given up on)."""
+        chat_id = str(chat_id)
+        done = asyncio.get_running_loop().create_future()
+        chunks = split_markdown(text)
+        if not chunks:
+            return
+        queue = self.queues.setdefault(chat_id, asyncio.Queue())
+        for i, chunk in enumerate(chunks):
+            queue.put_nowait((chunk, parse_mode, done if i == len(chunks) - 1 else None))
+        if chat_id not in self.workers or self.workers[chat_id].done():
+            self.workers[chat_id] = asyncio.create_task(self._worker(chat_id))
+        await done
+
+    async def _worker(self, chat_id: str):
+        queue = self.queues[chat_id]
+        try:
+            while True:
+                try:
+                    chunk, parse_mode, done = await asyncio.wait_for(queue.get(), self.idle_seconds)
+                except asyncio.TimeoutError:
+                    if queue.empty():
+                        return
+                    continue
+                try:
+                    await self._send(chat_id, chunk, parse_mode)
+                except Exception as e:
+                    self.metrics["failed"] += 1
+                    logger.error(f"Failed to deliver chunk to {chat_id}: {e}")
+                finally:
+                    if done is not None and not done.done():
+                        done.set_result(None)
+        finally:
+            # Idle exit or cancellation: release every deliver() still waiting on this chat
+            dropped = 0
+            while not queue.empty():
+                _, _, done = queue.get_nowait()
+                dropped += 1
+                if done is not None and not done.done():
+                    done.set_result(None)
+            if dropped:
+                self.metrics["failed"] += dropped
+                logger.warning(f"Delivery worker for {chat_id} stopped, dropped {dropped} queued chunk(s).")
+            if self.queues.get(chat_id) is queue:
+                self.queues.pop(chat_id, None)
+            if self.workers.get(chat_id) is asyncio.current_task():
+                self.workers.pop(chat_id, None)
+
+    async def _send(self, chat_id: str, chunk: str, parse_mode: str):
+        # Skip the doomed round trip: malformed Markdown goes out as plain text right away
+        if parse_mode == "Markdown" and not is_valid_markdown(chunk):
+            self.metrics["plain_fallbacks"] += 1
+            parse_mode = None
+        bucket = self._bucket(chat_id)
+        for attempt in range(1, self.max_attempts + 1):
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=chunk, parse_mode=parse_mode)
+                self.metrics["chunks"] += 1
+                return
+            except RetryAfter as e:
+                delay = e.retry_after.total_seconds() if isinstance(e.retry_after, datetime.timedelta) else float(e.retry_after)
+                self.metrics["retry_after"] += 1
+                bucket.block_for(delay)
+                # Telegram doesn't say which limit tripped: if the global bucket was drained, it was the 30/s one
+                if self.global_bucket.tokens < 1:
+                    self.global_bucket.block_for(delay)
+                    logger.warning(f"Flood control (global) for {chat_id}: pausing every chat {delay:.0f}s.")
+                else:
+                    logger.warning(f"Flood control for {chat_id}: pausing {delay:.0f}s.")
+            except BadRequest as e:
+                if parse_mode is None:
+                    raise
+                logger.warning(f"Markdown parse failed, falling back to plain text: {e}")
+                self.metrics["plain_fallbacks"] += 1
+                parse_mode = None
+            except (TimedOut, NetworkError) as e:
+                if attempt == self.max_attempts:
+                    raise
+                await asyncio.sleep(min(2 ** attempt, 10))
+        raise RuntimeError(f"gave up after {self.max_attempts} attempts")
+
+    def stats(self) -> dict:
+        return {"active_chats": len(self.workers), "queued": sum(q.qsize() for q in self.queues.values()), **self.metrics}
@@ -5,8 +5,8 @@ import httpx
 import logging
 from telegram import Update
 from telegram.ext import ApplicationBuilder, ContextTypes, MessageHandler, filters
-from telegram.error import BadRequest
 from dotenv import load_dotenv
+from delivery import DeliveryScheduler
 
 # Config Logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -22,32 +22,15 @@ LAST_ID_FILE = os.path.join(os.path.dirname(__file__), "../../.agent/brain/LAST_
 # Global Persistent Client for speed
 http_client = httpx.AsyncClient(timeout=180)
 
+# Outbound queue, created on first send
+delivery = None
+
 async def send_large_message(bot, chat_id, text):
-    """Splits a long message into chunks for Telegram with Markdown fallback."""
-    MAX_LENGTH = 4000
-    # Clean text to avoid some common markdown issues before sending
-    # But let the fallback handle the heavy lifting
-    chunks = [text[i:i+MAX_LENGTH] for i in range(0, len(text), MAX_LENGTH)]
-    
-    for chunk in chunks:
-        if not chunk.strip(): continue
-        try:
-            # Try with Markdown first
-            await bot.send_message(chat_id=chat_id, text=chunk, parse_mode="Markdown")
-        except BadRequest as e:
-            logger.warning(f"Markdown parse failed, falling back to plain text: {e}")
-            # Explicit fallback for any parsing error
-            try:
-                await bot.send_message(chat_id=chat_id, text=chunk)
-            except Exception as e2:
-                logger.error(f"Failed to send plain text message: {e2}")
-        except Exception as e:
-            logger.error(f"Unexpected error in send_large_message: {e}")
-            # Last ditch effort
-            try:
-                await bot.send_message(chat_id=chat_id, text=chunk)
-            except: pass
-        await asyncio.sleep(0.2)
+    """Delivers a message of any length through the rate-limited, Markdown-aware scheduler."""
+    global delivery
+    if delivery is None:
+        delivery = DeliveryScheduler(bot)
+    await delivery.deliver(chat_id, text)
 
 async def check_neural_bridge(application):
     """Periodically checks the NEURAL_BRIDGE.md for Antigravity responses."""
@@ -118,12 +101,12 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await send_large_message(context.bot, chat_id, reply)
         else:
             logger.error(f"Neural Core Error: {response.status_code}")
-            await context.bot.send_message(chat_id=chat_id, text=f"⚠️ Neural Core Busy ({response.status_code})")
+            await send_large_message(context.bot, chat_id, f"⚠️ Neural Core Busy ({response.status_code})")
             
     except Exception as e:
         stop_typing.set()
         logger.error(f"Connection error in handle_message: {e}")
-        await context.bot.send_message(chat_id=chat_id, text=f"❌ Connection Lag or Error: {str(e)[:100]}")
+        await send_large_message(context.bot, chat_id, f"❌ Connection Lag or Error: {str(e)[:100]}")
 
 async def main():
     if not TELEGRAM_BOT_TOKEN:
@@ -131,7 +114,7 @@ async def main():
         return
         
     logger.info("🚀 Ronaldinho Python Bridge starting...")
-    application = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).build()
+    application = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).concurrent_updates(True).build()
     
     # Start the monitor as a background task
     asyncio.create_task(check_neural_bridge(application))
@@ -0,0 +1,242 @@
+import os
+import re
+import sys
+import json
+import gzip
+import math
+import time
+import datetime
+import argparse
+from collections import Counter
+
+# Reads the evolution log back: per provider/model success rate, latency percentiles,
+# tokens/sec and error taxonomy over sliding windows, plus the routing table export.
+
+WINDOWS = {"1h": 3600, "24h": 86400, "7d": 7 * 86400, "all": None}
+LEGACY_LINE = re.compile(r"^\[(?P<time>[^\]]+)\] Provider: (?P<provider>.*?) \| Model: (?P<model>.*?) \| Status: (?P<status>\w+)(?: \| Error: (?P<error>.*))?$")
+BUCKET_BASE = 1.1 # ~5% worst-case percentile error, constant memory per route
+
+def _open(path: str):
+    return gzip.open(path, "rt", encoding="utf-8") if path.endswith(".gz") else open(path, "r", encoding="utf-8")
+
+def log_segments(log_path: str) -> list:
+    """Every file that makes up the log, oldest first: legacy text log, rotated .gz segments, active file."""
+    directory = os.path.dirname(log_path) or "."
+    base = os.path.splitext(os.path.basename(log_path))[0]
+    segments = []
+    legacy = os.path.join(directory, base + ".log")
+    if os.path.exists(legacy) and legacy != log_path:
+        segments.append(legacy)
+    if os.path.isdir(directory):
+        segments += sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.startswith(base + "-") and name.endswith(".jsonl.gz")
+        )
+    if os.path.exists(log_path):
+        segments.append(log_path)
+    return segments
+
+def _parse_legacy(line: str):
+    match = LEGACY_LINE.match(line)
+    if not match:
+        return None
+    try:
+        ts = datetime.datetime.strptime(match["time"], "%Y-%m-%d %H:%M:%S").timestamp()
+    except ValueError:
+        return None
+    record = {"ts": ts, "provider": match["provider"], "model": match["model"], "status": match["status"]}
+    if match["error"]:
+        record["error"] = match["error"]
+        record["error_class"] = match["error"].split(":", 1)[0].strip()[:60]
+    return record
+
+def iter_records(log_path: str, since: float = None):
+    """Streams records one line at a time (constant memory), across every segment."""
+    for segment in log_segments(log_path):
+        try:
+            with _open(segment) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    if line.startswith("{"):
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+                    else:
+                        record = _parse_legacy(line)
+                    if record is None or (since is not None and record.get("ts", 0) < since):
+                        continue
+                    yield record
+        except (OSError, EOFError) as e:
+            print(f"[!] Skipping unreadable segment {segment}: {e}", file=sys.stderr)
+
+class LatencyHistogram:
+    """Log-bucketed histogram: percentiles in O(buckets) memory regardless of sample count."""
+    def __init__(self):
+        self.buckets = Counter()
+        self.count = 0
+
+    def add(self, ms: float):
+        self.buckets[int(math.log(max(ms, 1.0), BUCKET_BASE))] += 1
+        self.count += 1
+
+    def percentile(self, q: float):
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= target:
+                # Geometric midpoint of the bucket
+                return round(BUCKET_BASE ** (bucket + 0.5), 1)
+        return None
+
+class RouteStats:
+    def __init__(self):
+        self.attempts = 0
+        self.successes = 0
+        self.latency = LatencyHistogram()
+        self.output_tokens = 0
+        self.token_seconds = 0.0
+        self.errors = Counter()
+        self.last_seen = 0.0
+
+    def add(self, record: dict):
+        self.attempts += 1
+        self.last_seen = max(self.last_seen, record.get("ts", 0))
+        if record.get("status") == "SUCCESS":
+            self.successes += 1
+            latency = record.get("latency_ms")
+            if latency is not None:
+                self.latency.add(latency)
+                if record.get("output_tokens"):
+                    self.output_tokens += record["output_tokens"]
+                    self.token_seconds += latency / 1000
+        else:
+            self.errors[record.get("error_class") or "Unknown"] += 1
+
+    def summary(self) -> dict:
+        return {
+            "attempts": self.attempts,
+            "success_rate": round(self.successes / self.attempts, 3) if self.attempts else 0.0,
+            "p50_ms": self.latency.percentile(0.50),
+            "p95_ms": self.latency.percentile(0.95),
+            "p99_ms": self.latency.percentile(0.99),
+            "tokens_per_sec": round(self.output_tokens / self.token_seconds, 1) if self.token_seconds else None,
+            "errors": dict(self.errors.most_common(5)),
+            "last_seen": self.last_seen
+        }
+
+def analyze(log_path: str, windows: list = None, now: float = None) -> dict:
+    """Single pass over the log feeding every window at once: {window: {"provider:model": summary}}."""
+    now = now or time.time()
+    windows = windows or list(WINDOWS)
+    cutoffs = {w: (now - WINDOWS[w]) if WINDOWS[w] else None for w in windows}
+    oldest = None if any(c is None for c in cutoffs.values()) else min(cutoffs.values())
+    stats = {w: {} for w in windows}
+    for record in iter_records(log_path, since=oldest):
+        route = f"{record.get('provider')}:{record.get('model')}"
+        ts = record.get("ts", 0)
+        for window, cutoff in cutoffs.items():
+            if cutoff is None or ts >= cutoff:
+                stats[window].setdefault(route, RouteStats()).add(record)
+    return {w: {route: s.summary() for route, s in sorted(routes.items())} for w, routes in stats.items()}
+
+def build_routing_table(route_summaries: dict, min_samples: int = 5, min_success_rate: float = 0.5) -> dict:
+    """
+    Ranks routes by expected latency to a successful answer (p50 / success rate).
+    Routes below min_success_rate are listed as demoted so the rotation tries them last.
+    """
+    ranked, demoted = [], []
+    for route, summary in route_summaries.items():
+        if summary["attempts"] < min_samples:
+            continue
+        provider, model = route.split(":", 1)
+        entry = {"provider": provider, "model": model, **{k: summary[k] for k in ("attempts", "success_rate", "p50_ms", "p95_ms")}}
+        if summary["success_rate"] < min_success_rate or summary["p50_ms"] is None:
+            demoted.append(entry)
+            continue
+        entry["score"] = round(summary["p50_ms"] / summary["success_rate"], 1)
+        ranked.append(entry)
+    ranked.sort(key=lambda e: e["score"])
+    demoted.sort(key=lambda e: e["success_rate"], reverse=True)
+    return {"generated_at": time.time(), "routes": ranked, "demoted": demoted}
+
+def export_routing_table(log_path: str, output_path: str, window: str = "24h", min_samples: int = 5) -> dict:
+    table = build_routing_table(analyze(log_path, [window])[window], min_samples=min_samples)
+    table["window"] = window
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    temp_path = output_path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(table, f, indent=2)
+    os.replace(temp_path, output_path)
+    return table
+
+def load_routing_table(path: str) -> tuple:
+    """(ranked, demoted) lists of (provider, model) routes; both empty if there is no usable table."""
+    if not path or not os.path.exists(path):
+        return [], []
+    try:
+        with open(path) as f:
+            table = json.load(f)
+        ranked = [(e["provider"], e["model"]) for e in table.get("routes", [])]
+        demoted = [(e["provider"], e["model"]) for e in table.get("demoted", [])]
+    except (OSError, ValueError, KeyError, TypeError):
+        return [], []
+    return ranked, demoted
+
+def order_routes(routes: list, ranked: list, demoted: list) -> list:
+    """
+    Reorders (provider, model) routes: ranked ones first in table order, then routes without
+    enough data in their static order, then demoted ones. Routes missing from `routes` are ignored.
+    """
+    rank = {route: i for i, route in enumerate(ranked)}
+    last = {route: i for i, route in enumerate(demoted)}
+    def key(item):
+        position, route = item
+        if route in rank:
+            return (0, rank[route])
+        if route in last:
+            return (2, last[route])
+        return (1, position)
+    return [route for _, route in sorted(enumerate(routes), key=key)]
+
+def _print_report(report: dict):
+    for window, routes in report.items():
+        print(f"\n=== Window: {window} ({len(routes)} routes) ===")
+        if not routes:
+            continue
+        print(f"{'route':<42} {'n':>6} {'ok%':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'tok/s':>7}  errors")
+        for route, s in sorted(routes.items(), key=lambda kv: (kv[1]["p50_ms"] is None, kv[1]["p50_ms"] or 0)):
+            fmt = lambda v: "-" if v is None else f"{v:.0f}"
+            errors = ", ".join(f"{k}×{v}" for k, v in s["errors"].items())
+            print(f"{route:<42} {s['attempts']:>6} {s['success_rate'] * 100:>5.1f}% {fmt(s['p50_ms']):>8} "
+                  f"{fmt(s['p95_ms']):>8} {fmt(s['p99_ms']):>8} {fmt(s['tokens_per_sec']):>7}  {errors}")
+
+if __name__ == "__main__":
+    from config import settings
+
+    parser = argparse.ArgumentParser(description="Provider performance analytics over the evolution log.")
+    parser.add_argument("command", choices=["report", "export"], nargs="?", default="report")
+    parser.add_argument("--log", default=os.path.join(settings.DATA_DIR, "evolution.jsonl"))
+    parser.add_argument("--window", action="append", choices=list(WINDOWS), help="Repeatable; defaults to all windows.")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    parser.add_argument("--output", default=settings.ROUTING_TABLE_PATH or os.path.join(settings.DATA_DIR, "routing_table.json"))
+    parser.add_argument("--min-samples", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        window = (args.window or ["24h"])[0]
+        table = export_routing_table(args.log, args.output, window=window, min_samples=args.min_samples)
+        print(f"[*] Routing table ({window}): {len(table['routes'])} ranked, {len(table['demoted'])} demoted -> {args.output}")
+        for i, e in enumerate(table["routes"], 1):
+            print(f"  {i}. {e['provider']}:{e['model']} score={e['score']} p50={e['p50_ms']}ms ok={e['success_rate']:.0%}")
+    else:
+        report = analyze(args.log, args.window)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            _print_report(report)
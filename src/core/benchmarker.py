@@ -47,8 +47,11 @@ async def test_model_capability(provider_name: str, api_key: str) -> bool:
     except Exception:
         return False
 
-async def get_latencies():
-    """Concurrently pings and tests all configured providers."""
+async def get_latencies(integrity: bool = True):
+    """
+    Concurrently pings all configured providers. With `integrity`, the three fastest also get
+    test_model_capability: a real (billed) completion request each.
+    """
     providers = {
         "gemini": ("https://generativelanguage.googleapis.com", settings.GEMINI_API_KEY),
         "openai": ("https://api.openai.com/v1/models", settings.OPENAI_API_KEY),
@@ -75,6 +78,8 @@ async def get_latencies():
     
     # Also check integrity for the top candidates
     latencies = dict(zip(names, ping_results))
+    if not integrity:
+        return latencies
     fastest_names = sorted([n for n in names if latencies[n] < 999.0], key=lambda n: latencies[n])[:3]
     
     integrity_tasks = [test_model_capability(name, providers[name][1]) for name in fastest_names]
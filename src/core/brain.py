@@ -1,4 +1,6 @@
 import os
+import re
+import hashlib
 import logging
 
 logger = logging.getLogger("neural-core")
@@ -7,8 +9,11 @@ logger = logging.getLogger("neural-core")
 _prompt_cache = {
     "base": None,
     "skills": None,
-    "personas": {}
+    "personas": {},
+    "versions": {},
+    "team": None
 }
+_cache_version = 0
 
 def load_soul_and_knowledge(root_path: str) -> str:
     """Loads a truncated soul for faster response. Knowledge is now handled via tools if needed."""
@@ -62,10 +67,96 @@ def get_integrated_system_prompt(root_path: str, active_persona: str = None) ->
 
 def clear_brain_cache():
     """Call this when .env or files are updated."""
-    global _prompt_cache
-    _prompt_cache = {"base": None, "skills": None, "personas": {}}
+    global _prompt_cache, _cache_version
+    _prompt_cache = {"base": None, "skills": None, "personas": {}, "versions": {}, "team": None}
+    _cache_version += 1
+    _persona_index.update(pattern=None, phrases={})
     logger.info("[🧠] Brain cache cleared.")
 
+def get_cache_version() -> int:
+    """Monotonic counter bumped on every cache clear, so downstream caches know when to rebuild."""
+    return _cache_version
+
+def get_prompt_version(root_path: str, active_persona: str = None) -> str:
+    """Content hash of the system prompt a persona resolves to. Changes only when its source files do."""
+    key = active_persona or ""
+    if key not in _prompt_cache["versions"]:
+        prompt = get_integrated_system_prompt(root_path, active_persona=active_persona)
+        _prompt_cache["versions"][key] = hashlib.sha1(prompt.encode()).hexdigest()[:12]
+    return _prompt_cache["versions"][key]
+
+def get_team_roster() -> list:
+    """Cached list of team persona slugs (kept fresh by the file watcher)."""
+    if _prompt_cache["team"] is None:
+        if os.path.isdir(TEAM_DIR):
+            _prompt_cache["team"] = sorted(f[:-len(".toon")] for f in os.listdir(TEAM_DIR) if f.endswith(".toon"))
+        else:
+            _prompt_cache["team"] = []
+    return _prompt_cache["team"]
+
+def on_agent_file_changed(path: str):
+    """File watcher hook: invalidates exactly the cache entries backed by the changed file."""
+    name = os.path.basename(path)
+    if os.path.dirname(os.path.abspath(path)) == TEAM_DIR:
+        if not name.endswith(".toon"):
+            return
+        persona = name[:-len(".toon")]
+        _prompt_cache["personas"].pop(persona, None)
+        _prompt_cache["versions"].pop(persona, None)
+        _prompt_cache["team"] = None
+        # Slugs may have been added or removed: recompile the routing index lazily
+        _persona_index.update(pattern=None)
+        logger.info(f"[🧠] Persona '{persona}' changed on disk, cache entry invalidated.")
+    elif name == "SOUL.md":
+        # Every persona prompt embeds the soul
+        _prompt_cache["base"] = None
+        _prompt_cache["versions"].clear()
+        logger.info("[🧠] SOUL.md changed on disk, base prompt invalidated.")
+
+# Hardcoded high-priority mappings (checked before the dynamic team slugs on ties)
+PERSONA_KEYWORDS = {
+    "architect": ["arquitetura", "projeto", "estrutura", "padrao", "desenho"],
+    "frontend": ["frontend", "ui", "ux", "tela", "css", "react", "html", "browser"],
+    "database": ["banco", "database", "sql", "postgres", "schema", "query", "mongo"],
+    "reviewer": ["bug", "fix", "erro", "consertar", "debug", "audit"],
+    "developer": ["codigo", "implemente", "crie", "desenvolva", "funcao", "script"],
+    "devops": ["docker", "deploy", "kubernetes", "k8s", "pipeline", "ci/cd", "infra"],
+    "security": ["seguranca", "security", "pentest", "vulnerabilidade", "auth"],
+    "business": ["saas", "negocio", "plano", "mercado", "roi", "produto"],
+    "prompt_engineer": ["prompt", "instrucao", "system prompt", "melhore o prompt"],
+    "rag_architect": ["rag", "retrieval", "vetorial", "embeddings"],
+}
+
+TEAM_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.agent/team"))
+
+_persona_index = {"pattern": None, "phrases": {}, "rank": {}}
+
+def build_persona_index():
+    """
+    Compiles every persona keyword and team slug into one word-bounded regex,
+    so routing a message is a single linear scan with no filesystem access.
+    """
+    phrases = {}
+    rank = {}
+    for persona, keywords in PERSONA_KEYWORDS.items():
+        rank.setdefault(persona, len(rank))
+        for kw in keywords:
+            phrases.setdefault(kw, []).append(persona)
+
+    # Dynamic slug matching: the 100+ roles by their slug or humanized name
+    for slug in get_team_roster():
+        rank.setdefault(slug, len(rank))
+        for phrase in {slug.lower(), slug.lower().replace("_", " ")}:
+            if slug not in phrases.setdefault(phrase, []):
+                phrases[phrase].append(slug)
+
+    # Longest phrases first so "system prompt" wins over "prompt"; optional plural suffix
+    alternation = "|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True))
+    pattern = re.compile(rf"(?<!\w)({alternation})(?:e?s)?(?!\w)")
+
+    _persona_index.update(pattern=pattern, phrases=phrases, rank=rank)
+    logger.debug(f"[🧠] Persona index built ({len(phrases)} phrases, {len(rank)} personas).")
+
 def detect_best_persona(message: str) -> str:
     """Heuristically determines the best specialist for a message."""
     msg = message.lower()
@@ -73,34 +164,22 @@ def detect_best_persona(message: str) -> str:
     # 0. High priority: Antigravity Signal
     if "[antigravity_sig]" in msg:
         return "antigravity_envoy"
-    
-    # 1. Hardcoded high-priority mappings
-    mappings = {
-        "architect": ["arquitetura", "projeto", "estrutura", "padrao", "desenho"],
-        "frontend": ["frontend", "ui", "ux", "tela", "css", "react", "html", "browser"],
-        "database": ["banco", "database", "sql", "postgres", "schema", "query", "mongo"],
-        "reviewer": ["bug", "fix", "erro", "consertar", "debug", "audit"],
-        "developer": ["codigo", "implemente", "crie", "desenvolva", "funcao", "script"],
-        "devops": ["docker", "deploy", "kubernetes", "k8s", "pipeline", "ci/cd", "infra"],
-        "security": ["seguranca", "security", "pentest", "vulnerabilidade", "auth"],
-        "business": ["saas", "negocio", "plano", "mercado", "roi", "produto"],
-        "prompt_engineer": ["prompt", "instrucao", "system prompt", "melhore o prompt"],
-        "rag_architect": ["rag", "retrieval", "vetorial", "embeddings"],
-    }
-    
-    for persona, keywords in mappings.items():
-        if any(kw in msg for kw in keywords):
-            return persona
-
-    # 2. Dynamic slug matching
-    # Check if the message contains any of the 100+ roles by their simplified name
-    team_dir = ".agent/team"
-    if os.path.exists(team_dir):
-        files = [f.replace(".toon", "") for f in os.listdir(team_dir) if f.endswith(".toon")]
-        for role_slug in files:
-            # Check if slug or humanized name is in message
-            humanized = role_slug.replace("_", " ")
-            if role_slug in msg or humanized in msg:
-                return role_slug
-
-    return None
+
+    # Rebuilt only after clear_brain_cache() or a team directory change reported by the watcher
+    if _persona_index["pattern"] is None:
+        build_persona_index()
+    pattern = _persona_index["pattern"]
+
+    # 1. Score every persona hit in one pass; multi-word phrases count per word
+    scores = {}
+    for match in pattern.finditer(msg):
+        phrase = match.group(1)
+        weight = len(phrase.split())
+        for persona in _persona_index["phrases"][phrase]:
+            scores[persona] = scores.get(persona, 0) + weight
+
+    if not scores:
+        return None
+    # 2. Highest score wins, ties go to the hardcoded mappings order, then the team slugs
+    rank = _persona_index["rank"]
+    return max(scores, key=lambda p: (scores[p], -rank[p]))
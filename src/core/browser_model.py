@@ -1,25 +1,182 @@
 import asyncio
 import os
+import re
+import uuid
+import hashlib
 import logging
 import json
-import httpx
+from urllib.parse import urlsplit
 from playwright.async_api import async_playwright
+from config import settings
+from browser_pool import PagePool
+from models import get_http_client
 
 logger = logging.getLogger("browser-model")
 
+CONVERSATION_URL = "https://chatgpt.com/backend-api/conversation"
+CHAT_URL = "https://chatgpt.com/c/"
+THREAD_GONE = {400, 404, 409, 410, 422} # Continuing an expired/deleted conversation
+INPUT_SELECTOR = "#prompt-textarea, textarea, div[contenteditable='true']"
+ASSISTANT_SELECTOR = "div[data-message-author-role='assistant']"
+STOP_SELECTOR = "button[data-testid='stop-button']"
+
+# Completion check, re-evaluated by Playwright on every DOM mutation (no fixed sleeps):
+# a new, non-empty assistant message exists and the stop-streaming button is gone.
+ANSWER_DONE_JS = """([count, assistant, stop]) => {
+    const messages = document.querySelectorAll(assistant);
+    if (messages.length <= count || document.querySelector(stop)) return false;
+    return messages[messages.length - 1].innerText.trim().length > 0;
+}"""
+
+# Pushes the growing answer to Python through the __ghostPartial binding (throttled).
+OBSERVE_PARTIALS_JS = """([count, assistant]) => {
+    if (window.__ghostObserver) window.__ghostObserver.disconnect();
+    let last = "", timer = null;
+    const flush = () => {
+        timer = null;
+        const messages = document.querySelectorAll(assistant);
+        if (messages.length <= count) return;
+        const text = messages[messages.length - 1].innerText;
+        if (text !== last) { last = text; window.__ghostPartial(text); }
+    };
+    window.__ghostObserver = new MutationObserver(() => { if (!timer) timer = setTimeout(flush, 150); });
+    window.__ghostObserver.observe(document.body, {childList: true, subtree: true, characterData: true});
+}"""
+
+async def iter_sse_text(lines, thread: dict = None):
+    """
+    Incremental parser for the conversation SSE stream: yields only the new assistant text
+    of each event and stops at [DONE]. Understands both the v1 delta encoding (JSON-patch
+    style "append" ops) and the legacy format that repeats the full text in every event.
+    `thread`, if given, receives the conversation_id, the assistant message_id and
+    done=True once [DONE] arrives (a stream that just stops never sets it).
+    """
+    thread = {} if thread is None else thread
+    text_path = "/message/content/parts/0"
+    emitted = 0 # length of the assistant text yielded so far (legacy format)
+    last_path = None
+    assistant = True
+    async for line in lines:
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            thread["done"] = True
+            return
+        if not data.startswith("{"):
+            continue
+        try:
+            event = json.loads(data)
+        except ValueError:
+            continue
+
+        value = event.get("v")
+        envelope = value if isinstance(value, dict) else event
+        if envelope.get("conversation_id"):
+            thread["conversation_id"] = envelope["conversation_id"]
+        message = envelope.get("message")
+        if isinstance(message, dict):
+            # Full message snapshot: legacy events, or the first event of a v1 stream
+            assistant = (message.get("author") or {}).get("role", "assistant") == "assistant"
+            if assistant and message.get("id"):
+                thread["message_id"] = message["id"]
+            parts = (message.get("content") or {}).get("parts") or []
+            full = "".join(p for p in parts if isinstance(p, str))
+            if assistant and len(full) > emitted:
+                yield full[emitted:]
+                emitted = len(full)
+            last_path = text_path
+            continue
+
+        # v1 deltas: {"p", "o", "v"}, a bare {"v"} continuing the previous path, or a "patch" batch
+        ops = value if event.get("o") == "patch" and isinstance(value, list) else [event]
+        for op in ops:
+            if not isinstance(op, dict) or "v" not in op:
+                continue
+            last_path = op.get("p", last_path)
+            if assistant and last_path == text_path and op.get("o", "append") == "append" and isinstance(op["v"], str):
+                emitted += len(op["v"])
+                yield op["v"]
+
+class ConversationStore:
+    """
+    Per-user ChatGPT thread pointers (conversation_id, parent_message_id and a hash of the
+    instructions the thread was started with), persisted as conversations.json in the session dir.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.threads = None
+
+    def _load(self) -> dict:
+        if self.threads is None:
+            try:
+                with open(self.path, "r") as f:
+                    self.threads = json.load(f)
+            except (OSError, ValueError):
+                self.threads = {}
+        return self.threads
+
+    def get(self, user_id: str):
+        return self._load().get(user_id)
+
+    def update(self, user_id: str, conversation_id: str, parent_message_id: str, context: str = None):
+        self._load()[user_id] = {
+            "conversation_id": conversation_id,
+            "parent_message_id": parent_message_id,
+            "context": context
+        }
+        self._save()
+
+    def drop(self, user_id: str):
+        if self._load().pop(user_id, None) is not None:
+            self._save()
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w") as f:
+                json.dump(self.threads, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.warning(f"[!] Could not persist conversations: {e}")
+
+def _context_key(context_preamble: str):
+    return hashlib.sha1(context_preamble.encode()).hexdigest()[:12] if context_preamble else None
+
+def _with_preamble(prompt: str, context_preamble: str) -> str:
+    return f"{context_preamble}\n\nUser Question: {prompt}" if context_preamble else prompt
+
+def _turn_text(prompt: str, context_preamble: str, thread) -> str:
+    """The preamble rides along on a new thread, or when the thread was started under other instructions."""
+    if thread and thread.get("context") == _context_key(context_preamble):
+        return prompt
+    return _with_preamble(prompt, context_preamble)
+
 class BrowserModel:
-    def __init__(self, session_dir: str):
+    def __init__(self, session_dir: str, pool_size: int = 3, pool_warm: int = 1, idle_seconds: float = 300.0,
+                 max_page_uses: int = 50, page_memory_mb: int = 512):
         self.session_dir = session_dir
         self.browser_context = None
         self.playwright = None
         self.access_token = None
-        self.user_pages = {} # Map user_id to page
+        # Pages are shared through a bounded pool instead of one page per user
+        self.pool = PagePool(self._new_page, pool_size, pool_warm, idle_seconds, max_page_uses, page_memory_mb)
+        self.setup_lock = None
+        self.partial_callbacks = {} # page -> on_partial(text) for the request running on it
+        self.conversations = ConversationStore(os.path.join(session_dir, "conversations.json"))
         self.user_agent = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
 
-    async def _setup(self, user_id="default_user", headless=True):
-        if not self.playwright:
-            self.playwright = await async_playwright().start()
-            self.browser_context = await self.playwright.chromium.launch_persistent_context(
+    async def _setup(self, headless=True):
+        if self.playwright:
+            return
+        if self.setup_lock is None:
+            self.setup_lock = asyncio.Lock()
+        async with self.setup_lock:
+            if self.playwright:
+                return
+            playwright = await async_playwright().start()
+            self.browser_context = await playwright.chromium.launch_persistent_context(
                 user_data_dir=self.session_dir,
                 headless=headless,
                 user_agent=self.user_agent,
@@ -30,21 +187,30 @@ class BrowserModel:
                     "--window-size=1280,720"
                 ]
             )
+            self.playwright = playwright
+        # Warm spare pages off the request path
+        asyncio.create_task(self.pool.prewarm())
+
+    async def _new_page(self):
+        page = await self.browser_context.new_page()
+        page.on("response", self._intercept_auth)
+        await page.expose_binding("__ghostPartial", self._on_partial)
+        await page.set_viewport_size({"width": 1280, "height": 720})
         
-        if user_id not in self.user_pages or self.user_pages[user_id].is_closed():
-            page = await self.browser_context.new_page()
-            page.on("response", self._intercept_auth)
-            await page.set_viewport_size({"width": 1280, "height": 720})
-            
-            # Initial load to chatgpt
-            try:
-                await page.goto("https://chatgpt.com", wait_until="domcontentloaded", timeout=30000)
-                await asyncio.sleep(2)
-            except: pass
-            
-            self.user_pages[user_id] = page
+        # Initial load to chatgpt, ready once the prompt box renders
+        try:
+            await page.goto("https://chatgpt.com", wait_until="domcontentloaded", timeout=30000)
+            await page.wait_for_selector(INPUT_SELECTOR, state="visible", timeout=15000)
+        except: pass
+        return page
 
-        return self.user_pages[user_id]
+    def _on_partial(self, source, text):
+        callback = self.partial_callbacks.get(source["page"])
+        if callback:
+            try:
+                callback(text)
+            except Exception as e:
+                logger.debug(f"on_partial callback failed: {e}")
 
     async def _extract_token_via_js(self, page):
         try:
@@ -78,101 +244,226 @@ class BrowserModel:
                     self._save_token(data["accessToken"])
             except: pass
 
-    async def generate_response(self, prompt: str, service="chatgpt", user_id="default_user") -> str:
+    async def generate_response(self, prompt: str, service="chatgpt", user_id="default_user", on_partial=None,
+                                context_preamble: str = None) -> str:
+        """
+        Answers through the ChatGPT API token or the Ghost browser. on_partial(text), if given,
+        receives the answer accumulated so far while the Ghost browser is still streaming it.
+        Each user continues their own ChatGPT thread; context_preamble is sent only when a new
+        thread has to be started (first message, expired thread) or, inside the same thread,
+        when the instructions changed (persona switch, edited soul).
+        """
         try:
-            return await asyncio.wait_for(self._generate_logic(prompt, service, user_id), timeout=95)
+            return await asyncio.wait_for(
+                self._generate_logic(prompt, service, user_id, on_partial, context_preamble), timeout=95
+            )
         except asyncio.TimeoutError:
             return "❌ Erro: Timeout (95s). O ChatGPT está demorando muito para responder."
         except Exception as e:
             logger.error(f"[!] Browser failure: {e}")
             return f"❌ Erro Crítico Motor: {str(e)}"
 
-    async def _generate_logic(self, prompt: str, service="chatgpt", user_id="default_user") -> str:
+    async def _generate_logic(self, prompt: str, service="chatgpt", user_id="default_user", on_partial=None,
+                              context_preamble: str = None) -> str:
         token_path = os.path.join(self.session_dir, "last_token.txt")
         if not self.access_token and os.path.exists(token_path):
             with open(token_path, "r") as f:
                 self.access_token = f.read().strip()
 
+        # Changed instructions (persona switch, edited soul) keep the thread: the new preamble
+        # is sent as part of the next turn. Only an expired thread starts a new conversation.
+        thread = self.conversations.get(user_id)
+        if thread and user_id not in self.pool.conversations:
+            self.pool.conversations[user_id] = CHAT_URL + thread["conversation_id"]
+
         # 1. AUTONOMOUS API MODE
         if self.access_token:
+            text = ""
             try:
-                async with httpx.AsyncClient() as client:
-                    headers = {
-                        "Authorization": f"Bearer {self.access_token}",
-                        "Content-Type": "application/json",
-                        "User-Agent": self.user_agent
-                    }
-                    payload = {
-                        "action": "next",
-                        "messages": [{
-                            "id": "cb1c876e-821f-11ed-a1eb-0242ac120002",
-                            "author": {"role": "user"},
-                            "content": {"content_type": "text", "parts": [prompt]},
-                            "metadata": {}
-                        }],
-                        "model": "auto",
-                        "parent_message_id": "cb1c876e-821f-11ed-a1eb-0242ac120002",
-                        "timezone_offset_min": -180,
-                        "history_and_training_disabled": False
-                    }
-                    resp = await client.post("https://chatgpt.com/backend-api/conversation", 
-                                          json=payload, headers=headers, timeout=30)
-                    if resp.status_code == 200:
-                        last_data = ""
-                        for line in resp.text.split("\n"):
-                            if line.startswith("data: "):
-                                try:
-                                    data_part = json.loads(line[6:])
-                                    if "message" in data_part and "content" in data_part["message"]:
-                                        last_data = "".join(data_part["message"]["content"]["parts"])
-                                except: pass
-                        if last_data: return last_data
-            except: pass
+                async for delta in self.stream_api(prompt, user_id, context_preamble):
+                    text += delta
+                    if on_partial:
+                        on_partial(text)
+            except Exception as e:
+                # A stream cut mid-answer is not an answer: discard it and ask again through the browser
+                logger.debug(f"API mode failed, falling back to the browser: {e}")
+                text = ""
+            if text: return text
 
         # 2. BROWSER GHOST MODE (Playwright)
-        page = await self._setup(user_id=user_id, headless=True)
+        await self._setup(headless=True)
         try:
-            if service == "chatgpt":
-                # Only goto if we are not already on chatgpt
-                if "chatgpt.com" not in page.url:
-                    await page.goto("https://chatgpt.com", wait_until="domcontentloaded", timeout=60000)
-                    await asyncio.sleep(3)
-                
-                if await page.query_selector("text=Log in") or await page.query_selector("text=Sign in"):
-                    return "❌ Erro: Login necessário no ChatGPT."
-
-                selectors = ["#prompt-textarea", "textarea", "div[contenteditable='true']"]
-                input_field = None
-                for _ in range(10):
-                    for s in selectors:
-                        input_field = await page.query_selector(s)
-                        if input_field: break
-                    if input_field: break
-                    await asyncio.sleep(1)
-                
-                if not input_field: return "❌ Erro: Campo de entrada não encontrado."
-
-                await input_field.fill(prompt)
-                await asyncio.sleep(1)
-                await page.keyboard.press("Enter")
-                
-                await asyncio.sleep(10)
-                try:
-                    await page.wait_for_selector("button[data-testid='send-button']:not([disabled])", timeout=120000)
-                except: pass
-                
-                messages = await page.query_selector_all("div[data-message-author-role='assistant']")
-                if messages: return await messages[-1].inner_text()
-                
-                return "❌ Erro: Resposta não detectada."
+            async with self.pool.page(user_id) as page:
+                return await self._ghost_chat(page, prompt, service, on_partial, user_id, context_preamble)
         except Exception as e:
             return f"❌ Erro Browser: {str(e)}"
+
+    def _drop_thread(self, user_id: str):
+        self.conversations.drop(user_id)
+        self.pool.conversations.pop(user_id, None)
+
+    async def stream_api(self, prompt: str, user_id: str = "default_user", context_preamble: str = None):
+        """
+        Async generator of answer text chunks from the conversation API, as they arrive.
+        Continues the user's thread with only the new turn (prefixed with the preamble when the
+        instructions changed since the thread was started); if the server no longer knows the
+        thread it starts a fresh one (with the preamble) before anything has been yielded.
+        Raises ConnectionError if the stream ends before [DONE]: what was yielded is incomplete.
+        """
+        headers = {
+            "Authorization": f"Bearer {self.access_token}",
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream",
+            "User-Agent": self.user_agent
+        }
+        # Shared keep-alive client: no TCP/TLS handshake per call
+        client = get_http_client("chatgpt")
+        thread = self.conversations.get(user_id)
+        for current in ((thread, None) if thread else (None,)):
+            payload = {
+                "action": "next",
+                "messages": [{
+                    "id": str(uuid.uuid4()),
+                    "author": {"role": "user"},
+                    "content": {"content_type": "text", "parts": [_turn_text(prompt, context_preamble, current)]},
+                    "metadata": {}
+                }],
+                "model": "auto",
+                "parent_message_id": current["parent_message_id"] if current else str(uuid.uuid4()),
+                "timezone_offset_min": -180,
+                "history_and_training_disabled": False,
+                "supported_encodings": ["v1"] # append-only deltas instead of the full text per event
+            }
+            if current:
+                payload["conversation_id"] = current["conversation_id"]
+
+            received = {}
+            async with client.stream("POST", CONVERSATION_URL, json=payload, headers=headers, timeout=30) as resp:
+                if current and resp.status_code in THREAD_GONE:
+                    logger.info(f"[🧵] Conversation for {user_id} expired (HTTP {resp.status_code}), starting a new one.")
+                    self._drop_thread(user_id)
+                    continue
+                if resp.status_code != 200:
+                    logger.debug(f"Conversation API returned HTTP {resp.status_code}")
+                    return
+                async for delta in iter_sse_text(resp.aiter_lines(), received):
+                    yield delta
+            if not received.get("done"):
+                raise ConnectionError("conversation stream ended before [DONE]")
+            if received.get("conversation_id") and received.get("message_id"):
+                self.conversations.update(
+                    user_id, received["conversation_id"], received["message_id"],
+                    _context_key(context_preamble)
+                )
+                self.pool.conversations[user_id] = CHAT_URL + received["conversation_id"]
+            return
+
+    async def _ghost_chat(self, page, prompt: str, service: str, on_partial=None, user_id: str = "default_user",
+                          context_preamble: str = None) -> str:
+        if service == "chatgpt":
+            # Only goto if we are not already on chatgpt (or still on a thread we just dropped)
+            if "chatgpt.com" not in page.url or (CHAT_URL in page.url and not self.conversations.get(user_id)):
+                await page.goto("https://chatgpt.com", wait_until="domcontentloaded", timeout=60000)
+
+            try:
+                input_field = await page.wait_for_selector(INPUT_SELECTOR, state="visible", timeout=15000)
+            except Exception:
+                input_field = None
+
+            if await page.query_selector("text=Log in") or await page.query_selector("text=Sign in"):
+                return "❌ Erro: Login necessário no ChatGPT."
+            if not input_field: return "❌ Erro: Campo de entrada não encontrado."
+
+            # A page outside /c/ is a new chat (first message, or the stored thread expired)
+            new_thread = CHAT_URL not in page.url
+            thread = None if new_thread else self.conversations.get(user_id)
+            await input_field.fill(_turn_text(prompt, context_preamble, thread))
+            answered, message_id = await self._send_and_wait(page, on_partial)
+            if not answered:
+                return "❌ Erro: Resposta não detectada."
+            match = re.search(r"/c/([\w-]+)", page.url)
+            if match and message_id:
+                self.conversations.update(user_id, match.group(1), message_id, _context_key(context_preamble))
+            return answered
         return "❌ Erro Desconhecido."
 
+    async def _send_and_wait(self, page, on_partial=None, timeout: float = 90.0) -> tuple:
+        """
+        Presses Enter and returns (answer, message_id) as soon as the DOM shows the answer finished
+        streaming. The conversation stream on the wire only corroborates it: a finished stream lets a
+        DOM check that timed out still return the rendered text, and a failed one stops the wait early.
+        """
+        before = len(await page.query_selector_all(ASSISTANT_SELECTOR))
+        stream_closed = asyncio.Event()
+        stream_failed = asyncio.Event()
+
+        def is_stream(request):
+            # Only the answer stream, not the prepare/init POSTs under /conversation/...
+            return request.method == "POST" and urlsplit(request.url).path.rstrip("/").endswith("/conversation")
+
+        async def on_request_finished(request):
+            if is_stream(request):
+                response = await request.response()
+                if response and "text/event-stream" in response.headers.get("content-type", ""):
+                    stream_closed.set()
+
+        def on_request_failed(request):
+            if is_stream(request):
+                stream_failed.set()
+
+        page.on("requestfinished", on_request_finished)
+        page.on("requestfailed", on_request_failed)
+        if on_partial:
+            self.partial_callbacks[page] = on_partial
+            await page.evaluate(OBSERVE_PARTIALS_JS, [before, ASSISTANT_SELECTOR])
+
+        dom_done = net_failed = None
+        try:
+            await page.keyboard.press("Enter")
+            dom_done = asyncio.ensure_future(page.wait_for_function(
+                ANSWER_DONE_JS, arg=[before, ASSISTANT_SELECTOR, STOP_SELECTOR], polling="mutation", timeout=timeout * 1000
+            ))
+            net_failed = asyncio.ensure_future(stream_failed.wait())
+            await asyncio.wait({dom_done, net_failed}, return_when=asyncio.FIRST_COMPLETED)
+            if not dom_done.done():
+                # The stream died on the wire; give the DOM a moment in case it still settles
+                await asyncio.wait({dom_done}, timeout=3.0)
+        finally:
+            for task in (dom_done, net_failed):
+                if task and not task.done():
+                    task.cancel()
+            page.remove_listener("requestfinished", on_request_finished)
+            page.remove_listener("requestfailed", on_request_failed)
+            if on_partial:
+                self.partial_callbacks.pop(page, None)
+                try:
+                    await page.evaluate("() => window.__ghostObserver && window.__ghostObserver.disconnect()")
+                except Exception:
+                    pass
+
+        finished = dom_done.done() and not dom_done.cancelled() and dom_done.exception() is None
+        if not finished and not stream_closed.is_set():
+            # Neither the DOM nor the wire saw the answer end: whatever is rendered is partial
+            return "", None
+        messages = await page.query_selector_all(ASSISTANT_SELECTOR)
+        if len(messages) > before:
+            return await messages[-1].inner_text(), await messages[-1].get_attribute("data-message-id")
+        return "", None
+
     async def close(self):
+        await self.pool.close()
         if self.browser_context: await self.browser_context.close()
         if self.playwright: await self.playwright.stop()
+        self.browser_context = None
+        self.playwright = None
 
 # Singleton
 session_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.agent/browser_session"))
-browser_model = BrowserModel(session_path)
+browser_model = BrowserModel(
+    session_path,
+    pool_size=settings.BROWSER_POOL_SIZE,
+    pool_warm=settings.BROWSER_POOL_WARM,
+    idle_seconds=settings.BROWSER_POOL_IDLE_SECONDS,
+    max_page_uses=settings.BROWSER_PAGE_MAX_USES,
+    page_memory_mb=settings.BROWSER_PAGE_MEMORY_LIMIT_MB
+)
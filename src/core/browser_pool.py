@@ -0,0 +1,202 @@
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger("browser-pool")
+
+HOME_URL = "https://chatgpt.com/"
+
+class PooledPage:
+    def __init__(self, page):
+        self.page = page
+        self.owner = None # user_id whose conversation is open on the page
+        self.uses = 0
+        self.created_at = time.monotonic()
+        self.last_used = time.monotonic()
+
+class PagePool:
+    """
+    Fixed-size pool of pre-warmed Chromium pages shared by every Browser Ghost user.
+    Callers wait on a semaphore for a free page (bounded RAM, FIFO admission), prefer the
+    page that already has their conversation open, and otherwise reopen their last
+    conversation URL on whichever page is free. Crashed, over-used or over-memory pages
+    are recycled on checkin; pages idle past idle_seconds are closed down to `warm`.
+    """
+    def __init__(self, factory, size: int = 3, warm: int = 1, idle_seconds: float = 300.0,
+                 max_uses: int = 50, memory_limit_mb: int = 512):
+        self.factory = factory # async () -> new page, already on chatgpt.com
+        self.size = max(1, size)
+        self.warm = min(max(0, warm), self.size)
+        self.idle_seconds = idle_seconds
+        self.max_uses = max_uses
+        self.memory_limit_mb = memory_limit_mb
+        self.idle = [] # PooledPage, most recently used last
+        self.pages = 0 # open or being opened
+        self.in_use = 0
+        self.conversations = {} # user_id -> last conversation URL
+        self.semaphore = None
+        self.loop = None
+        self.sweeper = None
+        self.waiting = 0
+        self.wait_times = deque(maxlen=200)
+        self.metrics = {"checkouts": 0, "created": 0, "affinity_hits": 0, "recycled": 0, "evicted": 0}
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.semaphore = asyncio.Semaphore(self.size)
+            self.sweeper = loop.create_task(self._sweep_idle())
+
+    async def _create(self) -> PooledPage:
+        self.pages += 1
+        try:
+            pooled = PooledPage(await self.factory())
+        except BaseException:
+            self.pages -= 1
+            raise
+        self.metrics["created"] += 1
+        return pooled
+
+    async def prewarm(self):
+        """Opens pages in the background until `warm` of them are idle."""
+        self._bind_loop()
+        while len(self.idle) < self.warm and self.pages < self.size:
+            # Holds a slot while opening so pages never exceed `size`
+            async with self.semaphore:
+                try:
+                    self.idle.append(await self._create())
+                except Exception as e:
+                    logger.warning(f"[!] Could not pre-warm browser page: {e}")
+                    return
+
+    async def _close(self, pooled: PooledPage):
+        self.pages -= 1
+        try:
+            if not pooled.page.is_closed():
+                await pooled.page.close()
+        except Exception:
+            pass
+
+    def _pick(self, user_id: str):
+        """Idle page already holding the user's conversation, else the least recently used one."""
+        for i, pooled in enumerate(self.idle):
+            if pooled.owner == user_id:
+                self.metrics["affinity_hits"] += 1
+                return self.idle.pop(i)
+        return self.idle.pop(0) if self.idle else None
+
+    async def checkout(self, user_id: str) -> PooledPage:
+        self._bind_loop()
+        self.waiting += 1
+        queued_at = time.monotonic()
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.wait_times.append(time.monotonic() - queued_at)
+        self.metrics["checkouts"] += 1
+
+        try:
+            pooled = self._pick(user_id)
+            while pooled is not None and pooled.page.is_closed():
+                self.metrics["recycled"] += 1
+                await self._close(pooled)
+                pooled = self._pick(user_id)
+            if pooled is None:
+                pooled = await self._create()
+            conversation = self.conversations.get(user_id)
+            if pooled.owner != user_id and (pooled.owner is not None or conversation):
+                # Never show one user another user's thread: reopen theirs or start a new chat
+                await pooled.page.goto(conversation or HOME_URL, wait_until="domcontentloaded", timeout=60000)
+            pooled.owner = user_id
+        except BaseException:
+            if pooled is not None:
+                await self._close(pooled)
+            self.semaphore.release()
+            raise
+        self.in_use += 1
+        return pooled
+
+    async def checkin(self, pooled: PooledPage, healthy: bool = True):
+        self.in_use -= 1
+        try:
+            pooled.uses += 1
+            pooled.last_used = time.monotonic()
+            if healthy and not pooled.page.is_closed() and "/c/" in pooled.page.url:
+                self.conversations[pooled.owner] = pooled.page.url
+            reason = None
+            if not healthy or pooled.page.is_closed():
+                reason = "unhealthy"
+            elif self.max_uses and pooled.uses >= self.max_uses:
+                reason = f"{pooled.uses} uses"
+            elif self.memory_limit_mb:
+                heap_mb = await self._heap_mb(pooled.page)
+                if heap_mb > self.memory_limit_mb:
+                    reason = f"{heap_mb:.0f}MB JS heap"
+            if reason:
+                self.metrics["recycled"] += 1
+                logger.info(f"[♻️] Recycling browser page ({reason}).")
+                await self._close(pooled)
+                asyncio.ensure_future(self.prewarm()) # top the warm pages back up
+            else:
+                self.idle.append(pooled)
+        finally:
+            self.semaphore.release()
+
+    async def _heap_mb(self, page) -> float:
+        try:
+            used = await page.evaluate("() => performance.memory ? performance.memory.usedJSHeapSize : 0")
+            return (used or 0) / (1024 * 1024)
+        except Exception:
+            return 0.0
+
+    @asynccontextmanager
+    async def page(self, user_id: str):
+        """Leases a page for one request; any exception (or cancellation) recycles it."""
+        pooled = await self.checkout(user_id)
+        healthy = False
+        try:
+            yield pooled.page
+            healthy = True
+        finally:
+            await asyncio.shield(self.checkin(pooled, healthy))
+
+    async def _sweep_idle(self):
+        while True:
+            await asyncio.sleep(max(1.0, self.idle_seconds / 2))
+            now = time.monotonic()
+            # self.idle is least recently used first, so the oldest pages go and `warm` stay
+            expired = [p for p in self.idle if now - p.last_used > self.idle_seconds]
+            expired = expired[:max(0, len(self.idle) - self.warm)]
+            for pooled in expired:
+                self.idle.remove(pooled)
+            for pooled in expired:
+                self.metrics["evicted"] += 1
+                await self._close(pooled)
+            if expired:
+                logger.info(f"[🧹] Closed {len(expired)} idle browser page(s).")
+
+    async def close(self):
+        if self.sweeper:
+            self.sweeper.cancel()
+            self.sweeper = None
+        for pooled in self.idle:
+            await self._close(pooled)
+        self.idle = []
+        self.loop = None
+
+    def stats(self) -> dict:
+        waits = sorted(self.wait_times)
+        return {
+            "size": self.size,
+            "pages": self.pages,
+            "idle": len(self.idle),
+            "in_use": self.in_use,
+            "queue_depth": self.waiting,
+            **self.metrics,
+            "wait_ms_avg": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+            "wait_ms_p95": round(waits[max(0, int(len(waits) * 0.95) - 1)] * 1000, 1) if waits else 0.0
+        }
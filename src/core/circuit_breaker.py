@@ -0,0 +1,105 @@
+import time
+import logging
+from config import settings
+from evolution_logger import evolution_logger
+
+logger = logging.getLogger("circuit-breaker")
+
+class CircuitBreaker:
+    """
+    Health state for a single provider:model route.
+    CLOSED lets traffic through, OPEN skips the route outright and
+    HALF_OPEN lets a single probe decide whether it recovered.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, key: str, failure_threshold: int = 3, reset_timeout: float = 60.0):
+        self.key = key
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at = None
+        self.last_error = None
+
+    def allow_request(self) -> bool:
+        now = time.monotonic()
+        if self.state == self.CLOSED:
+            return True
+
+        if self.state == self.OPEN:
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            self.probe_started_at = now
+            logger.info(f"[🔌] Circuit {self.key} half-open, sending probe.")
+            return True
+
+        # HALF_OPEN: one probe at a time. A probe that never reported back (e.g. a cancelled
+        # hedged attempt) is considered lost after reset_timeout so the route can't get stuck.
+        if self.probe_started_at is not None and now - self.probe_started_at < self.reset_timeout:
+            return False
+        self.probe_started_at = now
+        return True
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info(f"[🔌] Circuit {self.key} closed again.")
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.probe_started_at = None
+        self.last_error = None
+
+    def record_failure(self, error=None):
+        self.consecutive_failures += 1
+        self.last_error = str(error)[:120] if error else None
+        self.probe_started_at = None
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"[🔌] Circuit {self.key} opened after {self.consecutive_failures} failure(s).")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error
+        }
+
+class CircuitBreakerRegistry:
+    """Process-wide breakers keyed by 'provider:model_id', shared by every request."""
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers = {}
+
+    def get(self, provider: str, model_id: str = "default") -> CircuitBreaker:
+        key = f"{provider}:{model_id}"
+        if key not in self.breakers:
+            self.breakers[key] = CircuitBreaker(key, self.failure_threshold, self.reset_timeout)
+        return self.breakers[key]
+
+    def allow(self, provider: str, model_id: str = "default") -> bool:
+        return self.get(provider, model_id).allow_request()
+
+    def on_event(self, provider, model_id, status, error=None, **fields):
+        """EvolutionLogger listener: every logged outcome updates the route's health."""
+        breaker = self.get(provider, model_id)
+        if status == "SUCCESS":
+            breaker.record_success()
+        elif status == "FAILURE":
+            breaker.record_failure(error)
+
+    def snapshot(self) -> dict:
+        return {key: breaker.snapshot() for key, breaker in self.breakers.items()}
+
+# Global Instance
+circuit_breakers = CircuitBreakerRegistry(
+    failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=settings.CIRCUIT_BREAKER_RESET_SECONDS
+)
+evolution_logger.add_listener(circuit_breakers.on_event)
@@ -32,6 +32,76 @@ class Settings(BaseSettings):
     MODEL_PRIORITY: str = "gemini,nvidia,nim,openai,anthropic,groq,cerebras,sambanova,openrouter,mistral"
     CODING_MODEL_ID: str = "nvidia:meta/llama-3.1-405b-instruct"
     ENABLE_BENCHMARKING: bool = True
+    AGENT_POOL_SIZE: int = 8
+    # Hedged execution: race the next provider when the current one is slow (opt-in).
+    # Attempts race only while they use read-only tools; the first write_file/apply_patch/
+    # run_command/skill call commits that attempt and cancels the others (cancelling can't undo it)
+    HEDGED_EXECUTION: bool = False
+    HEDGE_DELAY_SECONDS: float = 3.0
+    HEDGE_DELAY_MODE: str = "fixed" # fixed | p95
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 3
+    CIRCUIT_BREAKER_RESET_SECONDS: float = 60.0
+    # Conversation memory (token estimates, per session)
+    MEMORY_TOKEN_BUDGET: int = 6000
+    MEMORY_SUMMARY_TOKENS: int = 600
+    MEMORY_MAX_TOOL_RESULT_TOKENS: int = 1500
+    # Session persistence
+    SESSION_BACKEND: str = "sqlite" # sqlite | memory
+    SESSION_DB_PATH: str = "" # Defaults to <DATA_DIR>/sessions.db
+    SESSION_IDLE_TTL_SECONDS: int = 3600
+    SESSION_MAX_ACTIVE: int = 500
+    SESSION_FLUSH_BATCH: int = 32
+    SESSION_FLUSH_INTERVAL: float = 2.0
+    # Response cache (exact + local similarity tiers, opt-in)
+    RESPONSE_CACHE_ENABLED: bool = False
+    RESPONSE_CACHE_TTL_SECONDS: int = 3600
+    RESPONSE_CACHE_MAX_ENTRIES: int = 2000
+    RESPONSE_CACHE_SIMILARITY: float = 0.9
+    # Shared provider connection pools
+    HTTP2_ENABLED: bool = True
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    # Skill execution in isolated worker processes
+    SKILL_EXECUTOR: str = "process" # process | inline
+    SKILL_WORKERS: int = 2
+    SKILL_TIMEOUT_SECONDS: float = 60.0
+    SKILL_MEMORY_LIMIT_MB: int = 1024
+    SKILL_CPU_LIMIT_SECONDS: int = 30
+    # Terminal/dev tool subprocesses
+    TOOL_MAX_CONCURRENCY: int = 8
+    TOOL_MAX_OUTPUT_BYTES: int = 64000
+    # Warm python_sandbox pool
+    SANDBOX_MODE: str = "auto" # auto | docker | local (local is not isolated: auto falls back to it without docker)
+    SANDBOX_POOL_SIZE: int = 2
+    SANDBOX_TIMEOUT_SECONDS: float = 30.0
+    SANDBOX_MEMORY_LIMIT_MB: int = 256
+    SANDBOX_CPU_LIMIT_SECONDS: int = 10
+    SANDBOX_IMAGE: str = "python:3.11-slim"
+    # Workspace code index (find_symbol / search_code tools)
+    CODE_INDEX_ENABLED: bool = True
+    CODE_INDEX_PATH: str = "" # Defaults to <DATA_DIR>/code_index.db
+    CODE_INDEX_MAX_FILE_KB: int = 512
+    # Structured evolution log (.agent/evolution.jsonl, written in the background)
+    EVOLUTION_LOG_BATCH: int = 64
+    EVOLUTION_LOG_FLUSH_INTERVAL: float = 1.0
+    EVOLUTION_LOG_MAX_MB: int = 10
+    EVOLUTION_LOG_BACKUPS: int = 10
+    # Measured routing table (python analytics.py export), loaded at startup to reorder the rotation
+    ROUTING_TABLE_ENABLED: bool = True
+    ROUTING_TABLE_PATH: str = "" # Defaults to <DATA_DIR>/routing_table.json
+    # Adaptive routing from live latency/error EWMAs and heartbeat provider probes
+    ROUTER_STRATEGY: str = "epsilon" # off | greedy | epsilon | weighted
+    ROUTER_EWMA_ALPHA: float = 0.3
+    ROUTER_EXPLORATION: float = 0.1
+    ROUTER_BENCHMARK_INTERVAL: float = 900.0 # Seconds between benchmarker runs (needs ENABLE_BENCHMARKING)
+    ROUTER_PROBE_INTEGRITY: bool = False # Also send a real (billed) prompt to the 3 fastest providers per run
+    # Browser Ghost page pool (shared Chromium pages instead of one per user)
+    BROWSER_POOL_SIZE: int = 3
+    BROWSER_POOL_WARM: int = 1
+    BROWSER_POOL_IDLE_SECONDS: float = 300.0
+    BROWSER_PAGE_MAX_USES: int = 50
+    BROWSER_PAGE_MEMORY_LIMIT_MB: int = 512
     PORT: int = 5000
     DATA_DIR: str = ".agent"
 
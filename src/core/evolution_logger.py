@@ -1,18 +1,151 @@
 import os
+import json
+import gzip
+import time
+import queue
+import atexit
+import shutil
+import logging
 import datetime
+import threading
+from config import settings
+
+logger = logging.getLogger("evolution-logger")
 
 class EvolutionLogger:
-    def __init__(self, log_path=".agent/evolution.log"):
+    """
+    Structured record of every model interaction, one JSON object per line.
+    log_event() only enqueues: a background writer thread drains the queue in batches
+    (by size or interval), rotates the file past max_bytes and gzips rotated segments,
+    so logging never does file I/O on the request path.
+    """
+    def __init__(self, log_path=".agent/evolution.jsonl", batch_size: int = 64, flush_interval: float = 1.0,
+                 max_bytes: int = 10 * 1024 * 1024, backups: int = 10, max_queue: int = 10000):
         self.log_path = log_path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.listeners = []
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.writer = None
+        self.writer_lock = threading.Lock()
+        self.metrics = {"written": 0, "dropped": 0, "batches": 0, "rotations": 0}
         os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
 
-    def log_event(self, provider, model_id, status, error=None):
-        """Logs a model interaction event."""
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        error_msg = f" | Error: {error}" if error else ""
-        log_entry = f"[{timestamp}] Provider: {provider} | Model: {model_id} | Status: {status}{error_msg}\n"
-        
-        with open(self.log_path, "a") as f:
-            f.write(log_entry)
+    def add_listener(self, callback):
+        """Registers callback(provider, model_id, status, error, **fields) to observe every logged event."""
+        self.listeners.append(callback)
+
+    def log_event(self, provider, model_id, status, error=None, **fields):
+        """
+        Logs a model interaction event. Optional fields: latency_ms, input_tokens,
+        output_tokens, persona, error_class, user_id (any extra keys are kept as-is).
+        """
+        record = {
+            "ts": round(time.time(), 3),
+            "time": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "provider": provider,
+            "model": model_id,
+            "status": status,
+        }
+        if error:
+            record["error"] = str(error)
+            # Call sites format errors as "ExceptionType: message"
+            record["error_class"] = fields.pop("error_class", None) or str(error).split(":", 1)[0].strip()[:60]
+        record.update({k: v for k, v in fields.items() if v is not None})
+
+        self._ensure_writer()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.metrics["dropped"] += 1
+
+        for callback in self.listeners:
+            try:
+                callback(provider, model_id, status, error, **fields)
+            except Exception:
+                pass
+
+    def _ensure_writer(self):
+        if self.writer is not None and self.writer.is_alive():
+            return
+        with self.writer_lock:
+            if self.writer is None or not self.writer.is_alive():
+                self.writer = threading.Thread(target=self._run, name="evolution-writer", daemon=True)
+                self.writer.start()
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                record = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                record = None
+            if record is StopIteration:
+                self._write(batch)
+                return
+            if record is not None:
+                batch.append(record)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._write(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _write(self, batch: list):
+        if not batch:
+            return
+        try:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in batch))
+                size = f.tell()
+            self.metrics["written"] += len(batch)
+            self.metrics["batches"] += 1
+            if size >= self.max_bytes:
+                self._rotate()
+        except Exception as e:
+            logger.error(f"[!] Failed to write evolution log batch ({len(batch)} records): {e}")
+
+    def segments(self) -> list:
+        """Rotated .jsonl.gz segments, oldest first."""
+        directory = os.path.dirname(self.log_path) or "."
+        base = os.path.splitext(os.path.basename(self.log_path))[0]
+        return sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.startswith(base + "-") and name.endswith(".jsonl.gz")
+        )
+
+    def _rotate(self):
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        base = os.path.splitext(self.log_path)[0]
+        rotated = f"{base}-{stamp}.jsonl"
+        os.replace(self.log_path, rotated)
+        with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(rotated)
+        self.metrics["rotations"] += 1
+        for old in self.segments()[:-self.backups] if self.backups > 0 else []:
+            os.remove(old)
+
+    def flush(self, timeout: float = 5.0):
+        """Stops the writer after it has drained everything queued so far."""
+        if self.writer is None or not self.writer.is_alive():
+            return
+        self.queue.put(StopIteration)
+        self.writer.join(timeout)
+        self.writer = None
+
+    def close(self):
+        self.flush()
+
+    def stats(self) -> dict:
+        return {"queued": self.queue.qsize(), **self.metrics}
 
-evolution_logger = EvolutionLogger()
+evolution_logger = EvolutionLogger(
+    batch_size=settings.EVOLUTION_LOG_BATCH,
+    flush_interval=settings.EVOLUTION_LOG_FLUSH_INTERVAL,
+    max_bytes=settings.EVOLUTION_LOG_MAX_MB * 1024 * 1024,
+    backups=settings.EVOLUTION_LOG_BACKUPS
+)
+atexit.register(evolution_logger.close)
@@ -0,0 +1,189 @@
+import os
+import time
+import errno
+import ctypes
+import ctypes.util
+import select
+import struct
+import logging
+import threading
+from ignore_rules import SKIPPED_DIRS
+
+logger = logging.getLogger("fs-watcher")
+
+# inotify(7) event masks
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+# IN_MODIFY is left out on purpose: IN_CLOSE_WRITE reports a finished write exactly once
+WATCH_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+def skip_dir(name: str) -> bool:
+    """Hidden, dunder and dependency/build directories (the code index's ignore list) are never watched."""
+    return name.startswith((".", "__")) or name in SKIPPED_DIRS
+
+class FileWatcher:
+    """
+    Dispatches callback(path) when files under the watched directories change.
+    Uses inotify in a background thread on Linux and falls back to mtime polling
+    elsewhere (or for directories that don't exist yet). Callbacks run on the
+    asyncio loop passed to start(), so they can touch loop-owned caches safely.
+    """
+    def __init__(self, poll_interval: float = 2.0):
+        self.poll_interval = poll_interval
+        self.watches = [] # (directory, callback, recursive)
+        self.loop = None
+        self.thread = None
+        self.running = False
+        self.inotify_fd = None
+        self.libc = None
+        self.wd_map = {} # inotify watch descriptor -> (directory, callback, recursive)
+        self.snapshots = {} # polled directory -> {path: (mtime_ns, size)}
+        self.watch_limit_hit = False
+
+    def watch(self, directory: str, callback, recursive: bool = False):
+        self.watches.append((os.path.abspath(directory), callback, recursive))
+
+    def start(self, loop=None):
+        if self.running:
+            return
+        self.loop = loop
+        self.running = True
+        self._init_inotify()
+        self.thread = threading.Thread(target=self._run, name="fs-watcher", daemon=True)
+        self.thread.start()
+        mode = "inotify" if self.inotify_fd is not None else "polling"
+        logger.info(f"[👁️] File watcher started ({mode}, {len(self.watches)} roots).")
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=self.poll_interval + 1)
+        if self.inotify_fd is not None:
+            os.close(self.inotify_fd)
+            self.inotify_fd = None
+
+    def _dispatch(self, callback, path: str):
+        def safe_call():
+            try:
+                callback(path)
+            except Exception as e:
+                logger.error(f"[!] Watch callback failed for {path}: {e}")
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(safe_call)
+        else:
+            safe_call()
+
+    # --- inotify backend ---
+    def _init_inotify(self):
+        try:
+            libc_name = ctypes.util.find_library("c")
+            if not libc_name:
+                return
+            libc = ctypes.CDLL(libc_name, use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                return
+            self.libc = libc
+            self.inotify_fd = fd
+        except (OSError, AttributeError):
+            self.inotify_fd = None
+
+    def _add_inotify_watch(self, directory: str, callback, recursive: bool) -> bool:
+        wd = self.libc.inotify_add_watch(self.inotify_fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            if ctypes.get_errno() == errno.ENOSPC and not self.watch_limit_hit:
+                self.watch_limit_hit = True
+                logger.warning("[!] inotify watch limit reached (fs.inotify.max_user_watches), some directories are not watched.")
+            return False
+        self.wd_map[wd] = (directory, callback, recursive)
+        if recursive:
+            # An unreadable subdirectory is skipped; it must not take the watcher thread down
+            try:
+                subdirs = [e.path for e in os.scandir(directory) if not skip_dir(e.name) and e.is_dir(follow_symlinks=False)]
+            except OSError as e:
+                logger.debug(f"Not watching below {directory}: {e}")
+                return True
+            for path in subdirs:
+                self._add_inotify_watch(path, callback, recursive)
+        return True
+
+    def _read_inotify_events(self):
+        try:
+            data = os.read(self.inotify_fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, name_len = EVENT_HEADER.unpack_from(data, offset)
+            raw_name = data[offset + EVENT_HEADER.size: offset + EVENT_HEADER.size + name_len]
+            offset += EVENT_HEADER.size + name_len
+
+            watch = self.wd_map.get(wd)
+            if watch is None:
+                continue
+            directory, callback, recursive = watch
+            if mask & IN_DELETE_SELF:
+                self.wd_map.pop(wd, None)
+                continue
+            name = raw_name.rstrip(b"\0").decode(errors="replace")
+            path = os.path.join(directory, name) if name else directory
+            if recursive and mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and not skip_dir(name):
+                self._add_inotify_watch(path, callback, recursive)
+            self._dispatch(callback, path)
+
+    # --- polling backend ---
+    def _snapshot(self, directory: str, recursive: bool) -> dict:
+        snapshot = {}
+        if not os.path.isdir(directory):
+            return snapshot
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = [d for d in dirs if recursive and not skip_dir(d)]
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                    snapshot[path] = (st.st_mtime_ns, st.st_size)
+                except OSError:
+                    pass
+        return snapshot
+
+    def _poll(self, directory: str, callback, recursive: bool):
+        previous = self.snapshots.get(directory)
+        current = self._snapshot(directory, recursive)
+        self.snapshots[directory] = current
+        if previous is None:
+            return
+        for path in previous.keys() | current.keys():
+            if previous.get(path) != current.get(path):
+                self._dispatch(callback, path)
+
+    def _run(self):
+        polled = []
+        for directory, callback, recursive in self.watches:
+            if self.inotify_fd is not None and os.path.isdir(directory) and self._add_inotify_watch(directory, callback, recursive):
+                continue
+            polled.append((directory, callback, recursive))
+            self._poll(directory, callback, recursive)
+
+        while self.running:
+            if self.inotify_fd is not None and self.wd_map:
+                ready, _, _ = select.select([self.inotify_fd], [], [], self.poll_interval)
+                if ready:
+                    self._read_inotify_events()
+            else:
+                time.sleep(self.poll_interval)
+
+            for directory, callback, recursive in polled:
+                self._poll(directory, callback, recursive)
+
+# Global Instance
+file_watcher = FileWatcher()
@@ -0,0 +1,5 @@
+# Directory names the workspace tools never descend into: dependency trees, virtualenvs and
+# build output. Shared by the code index and the file watcher; kept dependency-free so either
+# can import it without pulling in the other.
+
+SKIPPED_DIRS = {"node_modules", "__pycache__", "venv", "dist", "build"}
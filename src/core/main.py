@@ -1,14 +1,26 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from orchestrator import Orchestrator
+from orchestrator import Orchestrator, agent_pool, memory_store, process_runner, sandbox_pool, code_index, root_path
 from config import settings
 from auth import auth_manager
 from vault import vault
-from brain import clear_brain_cache
+from brain import clear_brain_cache, get_team_roster, on_agent_file_changed, TEAM_DIR
 from skills_engine import skills_engine
+from skill_executor import skill_executor
+from circuit_breaker import circuit_breakers
+from models import clear_model_cache, close_http_clients
+from response_cache import response_cache
+from fs_watcher import file_watcher
+from evolution_logger import evolution_logger
+from router import model_router
+from browser_model import browser_model
+from worker import NeuralHeartbeat
 import uvicorn
 import os
+import json
+import asyncio
 import subprocess
 
 app = FastAPI(title="Ronaldinho Neural Core (Python)")
@@ -23,6 +35,38 @@ app.add_middleware(
 )
 
 orchestrator = Orchestrator()
+heartbeat = NeuralHeartbeat(router=model_router)
+
+@app.on_event("startup")
+async def startup():
+    # Keep prompt, persona and skills caches hot, invalidating only what changed on disk
+    agent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.agent"))
+    file_watcher.watch(os.path.join(agent_dir, "soul"), on_agent_file_changed)
+    file_watcher.watch(TEAM_DIR, on_agent_file_changed)
+    file_watcher.watch(skills_engine.skills_dir, skills_engine.on_file_changed, recursive=True)
+    # Pre-warm the skill worker interpreters so the first skill call doesn't pay for them
+    if settings.SKILL_EXECUTOR == "process":
+        await skill_executor.start()
+    await sandbox_pool.start()
+    if settings.CODE_INDEX_ENABLED:
+        # Persistent index: after the first build a restart only stats the tree
+        asyncio.create_task(asyncio.to_thread(code_index.refresh))
+        file_watcher.watch(root_path, code_index.on_file_changed, recursive=True)
+    file_watcher.start(asyncio.get_running_loop())
+    # Background benchmarks keep the adaptive router's provider probes fresh
+    asyncio.create_task(heartbeat.start())
+
+@app.on_event("shutdown")
+async def shutdown():
+    heartbeat.stop()
+    file_watcher.stop()
+    memory_store.close()
+    await skill_executor.close()
+    await sandbox_pool.close()
+    code_index.close()
+    await browser_model.close()
+    evolution_logger.close()
+    await close_http_clients()
 
 class MessageRequest(BaseModel):
     message: str
@@ -35,12 +79,9 @@ class ConfigUpdateRequest(BaseModel):
 @app.get("/health")
 async def health_check():
     provider = settings.LLM_PROVIDER
-    team_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.agent/team"))
     browser_session = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.agent/browser_session"))
-    skills_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.agent/skills"))
     
     has_browser_session = os.path.exists(browser_session) and len(os.listdir(browser_session)) > 1
-    skills_count = len(os.listdir(skills_path)) if os.path.exists(skills_path) else 0
     
     return {
         "status": "ok", 
@@ -49,9 +90,19 @@ async def health_check():
         "version": "1.0.2",
         "llm_provider": provider,
         "benchmarking": settings.ENABLE_BENCHMARKING,
-        "active_team_count": len(os.listdir(team_path)) if os.path.exists(team_path) else 0,
-        "active_skills_count": skills_count,
-        "heartbeat": "active",
+        "active_team_count": len(get_team_roster()),
+        "active_skills_count": len(skills_engine.list_skills()),
+        "agent_pool": agent_pool.stats(),
+        "circuit_breakers": circuit_breakers.snapshot(),
+        "response_cache": response_cache.stats(),
+        "skill_executor": skill_executor.stats(),
+        "tool_processes": process_runner.stats(),
+        "sandbox_pool": sandbox_pool.stats(),
+        "code_index": code_index.stats(),
+        "evolution_log": evolution_logger.stats(),
+        "router": model_router.snapshot(),
+        "browser_pool": browser_model.pool.stats(),
+        "heartbeat": "active" if heartbeat.is_running else "stopped",
         "browser_ghost_mode": "active" if has_browser_session else "logged_out",
         "telegram_active": bool(settings.TELEGRAM_BOT_TOKEN)
     }
@@ -73,16 +124,10 @@ async def get_config():
 @app.get("/api/skills")
 async def list_skills():
     """Lists all installed skills and their metadata."""
-    skills_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.agent/skills"))
-    skills = []
-    if os.path.exists(skills_path):
-        for s in os.listdir(skills_path):
-            if os.path.isdir(os.path.join(skills_path, s)):
-                skills.append({
-                    "id": s,
-                    "name": s.replace("_", " ").title(),
-                    "status": "active"
-                })
+    skills = [
+        {"id": s, "name": s.replace("_", " ").title(), "status": "active"}
+        for s in skills_engine.list_skills()
+    ]
     return {"skills": skills}
 
 @app.post("/api/config/save")
@@ -125,6 +170,8 @@ async def save_config(request: ConfigUpdateRequest):
                 setattr(settings, k, v)
     
     clear_brain_cache()
+    clear_model_cache()
+    response_cache.clear()
     skills_engine.refresh_cache()
     return {"status": "success", "message": "Configurações salvas e aplicadas em tempo real (Core)."}
 
@@ -138,6 +185,41 @@ async def chat(request: MessageRequest):
         status_code = 429 if "quota" in error_msg.lower() or "429" in error_msg else 503
         raise HTTPException(status_code=status_code, detail=error_msg)
 
+@app.post("/api/chat/stream")
+async def chat_stream(request: MessageRequest):
+    """Server-Sent Events version of /api/chat: tokens and tool calls are forwarded as they happen."""
+    async def event_source():
+        try:
+            async for event in orchestrator.stream_message(request.message, user_id=request.user_id):
+                yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'type': 'error', 'detail': str(e)}, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/api/chat/ws")
+async def chat_websocket(websocket: WebSocket):
+    """WebSocket variant of the streaming chat: send {"message", "user_id"}, receive the same events as SSE."""
+    await websocket.accept()
+    try:
+        while True:
+            frame = await websocket.receive_text()
+            try:
+                # A malformed frame gets an error event; the socket stays open for the next one
+                request = MessageRequest(**json.loads(frame))
+                async for event in orchestrator.stream_message(request.message, user_id=request.user_id):
+                    await websocket.send_text(json.dumps(event, ensure_ascii=False, default=str))
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                await websocket.send_text(json.dumps({"type": "error", "detail": str(e)}, ensure_ascii=False))
+    except WebSocketDisconnect:
+        pass
+
 @app.post("/api/browser/login")
 async def browser_login():
     """Triggers the manual browser login script with DISPLAY inheritance."""
@@ -154,10 +236,9 @@ async def browser_login():
 
 @app.get("/api/antigravity/sync")
 async def antigravity_sync():
-    team_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.agent/team"))
     return {
         "soul": "integrated",
-        "active_team_count": len(os.listdir(team_path)) if os.path.exists(team_path) else 0,
+        "active_team_count": len(get_team_roster()),
         "protocol": "PROTOCOL_ANTIGRAVITY.md found",
         "edition": "OpenClaw Pro"
     }
@@ -0,0 +1,135 @@
+import json
+import logging
+from dataclasses import replace
+from pydantic_ai.messages import (
+    ModelRequest, SystemPromptPart, UserPromptPart,
+    TextPart, ToolCallPart, ToolReturnPart
+)
+
+logger = logging.getLogger("neural-memory")
+
+# Rough heuristic (~4 chars per token) is plenty to bound prompt size without a tokenizer
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+SUMMARY_HEADER = "### CONVERSATION SUMMARY (older turns, compacted)"
+
+def _to_text(content) -> str:
+    if content is None:
+        return ""
+    if isinstance(content, str):
+        return content
+    try:
+        return json.dumps(content, ensure_ascii=False, default=str)
+    except Exception:
+        return str(content)
+
+def message_text(message) -> str:
+    """Flattens a PydanticAI message (or a browser-style dict) into plain text."""
+    if isinstance(message, dict):
+        return _to_text(message.get("content"))
+    parts = getattr(message, "parts", [])
+    return "\n".join(_to_text(getattr(p, "content", None) or getattr(p, "args", None)) for p in parts)
+
+def estimate_tokens(message) -> int:
+    return len(message_text(message)) // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS
+
+def _starts_turn(message) -> bool:
+    if isinstance(message, dict):
+        return message.get("role") == "user"
+    return isinstance(message, ModelRequest) and any(isinstance(p, UserPromptPart) for p in message.parts)
+
+def split_turns(history: list) -> list:
+    """
+    Groups messages into turns that each start at a user prompt. Tool calls and their
+    results always live inside the same turn, so evicting whole turns never splits a pair.
+    """
+    turns = []
+    for message in history:
+        if not turns or _starts_turn(message):
+            turns.append([message])
+        else:
+            turns[-1].append(message)
+    return turns
+
+def cap_tool_results(messages: list, max_tokens: int) -> list:
+    """Truncates oversized tool results (e.g. a whole file dump) before they enter the history."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    capped = []
+    for message in messages:
+        if isinstance(message, ModelRequest) and any(isinstance(p, ToolReturnPart) for p in message.parts):
+            parts = []
+            for part in message.parts:
+                text = _to_text(part.content) if isinstance(part, ToolReturnPart) else ""
+                if len(text) > max_chars:
+                    part = replace(part, content=f"{text[:max_chars]}\n[... {len(text) - max_chars} chars truncated from memory]")
+                parts.append(part)
+            message = replace(message, parts=parts)
+        capped.append(message)
+    return capped
+
+def _clip(text: str, limit: int = 160) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit] + "..."
+
+def summarize_turn(turn: list) -> str:
+    """One extractive summary line per turn: the question, tools used and the final answer."""
+    question, answer, tools = "", "", []
+    for message in turn:
+        if isinstance(message, dict):
+            if message.get("role") == "user" and not question:
+                question = _to_text(message.get("content"))
+            elif message.get("role") == "assistant":
+                answer = _to_text(message.get("content"))
+            continue
+        for part in message.parts:
+            if isinstance(part, UserPromptPart) and not question:
+                question = _to_text(part.content)
+            elif isinstance(part, ToolCallPart):
+                tools.append(part.tool_name)
+            elif isinstance(part, TextPart):
+                answer = part.content
+    line = f"- User: {_clip(question)}"
+    if tools:
+        line += f" | Tools: {', '.join(dict.fromkeys(tools))}"
+    if answer:
+        line += f" | Assistant: {_clip(answer)}"
+    return line
+
+def pinned_parts(turn: list) -> list:
+    """System prompt parts of an evicted turn, kept so the agent doesn't lose its instructions."""
+    return [
+        part for message in turn if isinstance(message, ModelRequest)
+        for part in message.parts if isinstance(part, SystemPromptPart)
+    ]
+
+def compact_history(history: list, summary_lines: list, token_budget: int, summary_budget: int):
+    """
+    Evicts the oldest whole turns until the history fits token_budget, folding each one into
+    the rolling summary. The most recent turn is always kept verbatim.
+    Returns (history, summary_lines, evicted_turns).
+    """
+    turns = split_turns(history)
+    costs = [sum(estimate_tokens(m) for m in turn) for turn in turns]
+    summary_cost = sum(len(line) for line in summary_lines) // CHARS_PER_TOKEN
+
+    evicted = []
+    while len(turns) > 1 and sum(costs) + summary_cost > token_budget:
+        turn = turns.pop(0)
+        costs.pop(0)
+        evicted.append(turn)
+        summary_lines.append(summarize_turn(turn))
+        # Rolling summary: keep the newest lines within its own budget
+        while len(summary_lines) > 1 and sum(len(line) for line in summary_lines) // CHARS_PER_TOKEN > summary_budget:
+            summary_lines.pop(0)
+        summary_cost = sum(len(line) for line in summary_lines) // CHARS_PER_TOKEN
+
+    if evicted:
+        logger.debug(f"[🧠] Compacted {len(evicted)} turn(s) into the rolling summary.")
+    return [m for turn in turns for m in turn], summary_lines, evicted
+
+def build_summary_message(summary_lines: list, pinned: list, like):
+    """Materializes the summary in the same message flavour as the history it precedes."""
+    text = SUMMARY_HEADER + "\n" + "\n".join(summary_lines)
+    if isinstance(like, dict):
+        return {"role": "system", "content": text}
+    return ModelRequest(parts=list(pinned) + [SystemPromptPart(content=text)])
@@ -1,4 +1,6 @@
 import logging
+import hashlib
+import importlib.util
 import httpx
 from pydantic_ai.models.gemini import GeminiModel
 from pydantic_ai.models.openai import OpenAIChatModel
@@ -19,6 +21,50 @@ GEMINI_ROTATION_MODELS = [
     "gemini-1.5-pro"
 ]
 
+# Long-lived connection pools (one per provider) and ready-made model instances.
+# Reusing them keeps TLS sessions and keep-alive connections off the request hot path.
+_http_clients = {}
+_model_cache = {}
+
+def get_http_client(provider_name: str) -> httpx.AsyncClient:
+    """Shared pooled AsyncClient for a provider, HTTP/2 when the h2 package is available."""
+    client = _http_clients.get(provider_name)
+    if client is None or client.is_closed:
+        http2 = settings.HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+        client = httpx.AsyncClient(
+            http2=http2,
+            timeout=httpx.Timeout(600, connect=5),
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+            )
+        )
+        _http_clients[provider_name] = client
+    return client
+
+def _key_fingerprint(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+def _cached_model(provider_name: str, model_id: str, api_key: str, factory):
+    """Returns the cached model for (provider, model_id, key fingerprint), building it once."""
+    cache_key = (provider_name, model_id, _key_fingerprint(api_key))
+    model = _model_cache.get(cache_key)
+    if model is None:
+        model = factory()
+        _model_cache[cache_key] = model
+    return model
+
+def clear_model_cache():
+    """Drops cached model/provider instances (e.g. after API keys change). Connection pools are kept."""
+    _model_cache.clear()
+    logger.info("[🔗] Model instance cache cleared.")
+
+async def close_http_clients():
+    for client in _http_clients.values():
+        await client.aclose()
+    _http_clients.clear()
+
 def get_model_instance(provider_name: str, model_id: str = None):
     """
     Unified gateway to fetch specialized model instances.
@@ -29,30 +75,38 @@ def get_model_instance(provider_name: str, model_id: str = None):
         if provider_name == "gemini":
             api_key = settings.GEMINI_API_KEY
             if not api_key: return None
-            provider = GoogleGLAProvider(api_key=api_key)
-            return GeminiModel(model_id or "gemini-2.0-flash", provider=provider)
+            model_id = model_id or "gemini-2.0-flash"
+            return _cached_model(provider_name, model_id, api_key, lambda: GeminiModel(
+                model_id, provider=GoogleGLAProvider(api_key=api_key, http_client=get_http_client(provider_name))
+            ))
         
         # 2. OPENAI (Direct or OpenRouter via base_url)
         elif provider_name == "openai" or provider_name == "openrouter":
             api_key = settings.OPENAI_API_KEY
             base_url = "https://openrouter.ai/api/v1" if provider_name == "openrouter" else None
             if not api_key: return None
-            provider = OpenAIProvider(api_key=api_key, base_url=base_url)
-            return OpenAIChatModel(model_id or "gpt-4o", provider=provider)
+            model_id = model_id or "gpt-4o"
+            return _cached_model(provider_name, model_id, api_key, lambda: OpenAIChatModel(
+                model_id, provider=OpenAIProvider(api_key=api_key, base_url=base_url, http_client=get_http_client(provider_name))
+            ))
 
         # 3. ANTHROPIC CLAUDE
         elif provider_name == "anthropic":
             api_key = settings.ANTHROPIC_API_KEY
             if not api_key: return None
-            provider = AnthropicProvider(api_key=api_key)
-            return AnthropicModel(model_id or "claude-3-5-sonnet-latest", provider=provider)
+            model_id = model_id or "claude-3-5-sonnet-latest"
+            return _cached_model(provider_name, model_id, api_key, lambda: AnthropicModel(
+                model_id, provider=AnthropicProvider(api_key=api_key, http_client=get_http_client(provider_name))
+            ))
 
         # 4. NVIDIA NIM (Standard OpenAI compatible)
         elif provider_name == "nvidia":
             api_key = settings.NVIDIA_API_KEY
             if not api_key: return None
-            provider = OpenAIProvider(api_key=api_key, base_url="https://integrate.api.nvidia.com/v1")
-            return OpenAIChatModel(model_id or "meta/llama-3.1-405b-instruct", provider=provider)
+            model_id = model_id or "meta/llama-3.1-405b-instruct"
+            return _cached_model(provider_name, model_id, api_key, lambda: OpenAIChatModel(
+                model_id, provider=OpenAIProvider(api_key=api_key, base_url="https://integrate.api.nvidia.com/v1", http_client=get_http_client(provider_name))
+            ))
 
     except Exception as e:
         logger.warning(f"[!] Error initializing provider {provider_name}: {e}")
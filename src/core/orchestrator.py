@@ -1,59 +1,216 @@
 import os
 import logging
 import random
+import time
 import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
 from pydantic_ai import Agent, RunContext
+from pydantic_ai.messages import (
+    ModelRequest, ModelResponse, UserPromptPart,
+    PartStartEvent, PartDeltaEvent, TextPart, TextPartDelta, ToolCallPart,
+    FunctionToolCallEvent, FunctionToolResultEvent
+)
 
 from config import settings
 from tools.terminal import TerminalTool
 from tools.editor import EditorTool
 from tools.dev_toolkit import DevToolkit
-from brain import detect_best_persona, get_integrated_system_prompt
+from tools.process import ProcessRunner
+from tools.sandbox_pool import SandboxPool
+from tools.code_index import CodeIndex
+from brain import detect_best_persona, get_integrated_system_prompt, get_cache_version, get_prompt_version
 from gemini_cli_local import gemini_cli
 from evolution_logger import evolution_logger
+from circuit_breaker import circuit_breakers
+from analytics import load_routing_table, order_routes
+from router import model_router
 from models import get_boot_model, get_model_instance, GEMINI_ROTATION_MODELS
 from browser_model import browser_model
 from skills_engine import skills_engine
+from memory import compact_history, cap_tool_results, pinned_parts, build_summary_message
+from response_cache import response_cache, history_fingerprint
+from session_store import SessionBackend, InMemorySessionBackend, create_session_backend
 
 logger = logging.getLogger("neural-core")
 if not logger.handlers:
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
 class ExecutionLane:
-    """Ensures serial execution per user/session."""
+    """
+    Ensures serial execution per user/session. Each lane counts its holders and waiters,
+    so a lock is only garbage-collected once nobody holds or is queued on it.
+    """
     def __init__(self):
         self.locks = {}
+        self.users = {} # user_id -> requests holding or waiting for the lane
 
     def get_lock(self, user_id: str) -> asyncio.Lock:
         if user_id not in self.locks:
             self.locks[user_id] = asyncio.Lock()
         return self.locks[user_id]
 
+    @asynccontextmanager
+    async def hold(self, user_id: str):
+        """Runs the block in the user's lane; counted from before acquire until after release."""
+        self.users[user_id] = self.users.get(user_id, 0) + 1
+        try:
+            async with self.get_lock(user_id):
+                yield
+        finally:
+            self.users[user_id] -= 1
+            if not self.users[user_id]:
+                del self.users[user_id]
+
+    def is_busy(self, user_id: str) -> bool:
+        # lock.locked() is False between a release and the next waiter waking up: count instead
+        return self.users.get(user_id, 0) > 0
+
+    def release(self, user_id: str):
+        """Garbage-collects an idle session's lock."""
+        if not self.is_busy(user_id):
+            self.locks.pop(user_id, None)
+
+class SessionContext:
+    """Per-user conversation state: persona, agent handle and history travel together."""
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.persona = "default"
+        self.agent = None
+        self.history = []
+        self.summary = [] # Rolling summary lines of compacted turns
+        self.pinned = [] # System prompt parts salvaged from compacted turns
+        self.token_budget = None # Per-session ceiling, falls back to MEMORY_TOKEN_BUDGET
+        self.last_active = time.monotonic()
+
+    def context(self) -> list:
+        """History as sent to the model: rolling summary first, then the recent turns verbatim."""
+        if not self.summary:
+            return self.history
+        like = self.history[0] if self.history else None
+        return [build_summary_message(self.summary, self.pinned, like)] + self.history
+
 class MemoryStore:
-    """Persistent chat history to save tokens and maintain context."""
-    def __init__(self):
-        self.histories = {}
+    """
+    Token-budgeted chat history: old turns are compacted into a rolling summary.
+    Sessions are persisted through a pluggable backend, rehydrated lazily on first
+    access and evicted (with their lanes) once idle or over the LRU capacity.
+    """
+    def __init__(self, backend: SessionBackend = None, lanes: ExecutionLane = None):
+        self.backend = backend or InMemorySessionBackend()
+        self.lanes = lanes
+        self.sessions = OrderedDict()
+        self.last_sweep = time.monotonic()
+
+    def get_session(self, user_id: str) -> SessionContext:
+        session = self.sessions.get(user_id)
+        if session is None:
+            session = self._rehydrate(user_id)
+            self.sessions[user_id] = session
+            self.evict_idle()
+        self.sessions.move_to_end(user_id)
+        session.last_active = time.monotonic()
+        return session
+
+    def _rehydrate(self, user_id: str) -> SessionContext:
+        session = SessionContext(user_id)
+        try:
+            state = self.backend.load(user_id)
+        except Exception as e:
+            logger.error(f"[!] Failed to rehydrate session {user_id}: {e}")
+            state = None
+        if state:
+            session.persona = state["persona"]
+            session.history = state["history"]
+            session.summary = state["summary"]
+            session.pinned = state["pinned"]
+            logger.info(f"[💾] Session {user_id} rehydrated ({len(session.history)} messages).")
+        return session
+
+    def evict_idle(self, force: bool = False):
+        """Drops idle sessions (TTL) and the least recently used ones beyond SESSION_MAX_ACTIVE."""
+        now = time.monotonic()
+        sweep_ttl = force or now - self.last_sweep > 60
+        if not sweep_ttl and len(self.sessions) <= settings.SESSION_MAX_ACTIVE:
+            return
+        if sweep_ttl:
+            self.last_sweep = now
+
+        for user_id, session in list(self.sessions.items()):
+            over_capacity = len(self.sessions) > settings.SESSION_MAX_ACTIVE
+            idle = now - session.last_active > settings.SESSION_IDLE_TTL_SECONDS
+            if not over_capacity and not (sweep_ttl and idle):
+                continue
+            if self.lanes and self.lanes.is_busy(user_id):
+                continue
+            del self.sessions[user_id]
+            if self.lanes:
+                self.lanes.release(user_id)
+        self.backend.flush()
 
     def get_history(self, user_id: str):
-        if user_id not in self.histories:
-            self.histories[user_id] = []
-        return self.histories[user_id]
+        return self.get_session(user_id).context()
+
+    def set_token_budget(self, user_id: str, tokens: int):
+        self.get_session(user_id).token_budget = tokens
 
     def add_interaction(self, user_id: str, messages: list):
-        current = self.get_history(user_id)
-        current.extend(messages)
-        # Keep last 20 interactions to save tokens
-        if len(current) > 40:
-            self.histories[user_id] = current[-40:]
+        session = self.get_session(user_id)
+        messages = cap_tool_results(messages, settings.MEMORY_MAX_TOOL_RESULT_TOKENS)
+        session.history.extend(messages)
+
+        budget = session.token_budget or settings.MEMORY_TOKEN_BUDGET
+        session.history, session.summary, evicted = compact_history(
+            session.history, session.summary, budget, settings.MEMORY_SUMMARY_TOKENS
+        )
+        for turn in evicted:
+            if not session.pinned:
+                session.pinned = pinned_parts(turn)
+
+        try:
+            if evicted:
+                # History was rewritten: snapshot it so older log rows can be pruned
+                self.backend.checkpoint(user_id, {
+                    "persona": session.persona,
+                    "history": session.history,
+                    "summary": session.summary,
+                    "pinned": session.pinned
+                })
+            else:
+                self.backend.append(user_id, messages, session.persona)
+        except Exception as e:
+            logger.error(f"[!] Failed to persist session {user_id}: {e}")
+
+    def close(self):
+        self.backend.close()
 
 lane_manager = ExecutionLane()
-memory_store = MemoryStore()
+memory_store = MemoryStore(create_session_backend(settings), lanes=lane_manager)
 
 # Global Tools Initialization
 root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
-terminal = TerminalTool(root_path)
+# One runner bounds concurrent tool processes across every agent and user
+process_runner = ProcessRunner(settings.TOOL_MAX_CONCURRENCY, settings.TOOL_MAX_OUTPUT_BYTES)
+terminal = TerminalTool(root_path, process_runner)
 editor = EditorTool(root_path)
-dev_toolkit = DevToolkit(root_path)
+sandbox_pool = SandboxPool(
+    mode=settings.SANDBOX_MODE,
+    size=settings.SANDBOX_POOL_SIZE,
+    timeout=settings.SANDBOX_TIMEOUT_SECONDS,
+    memory_mb=settings.SANDBOX_MEMORY_LIMIT_MB,
+    cpu_seconds=settings.SANDBOX_CPU_LIMIT_SECONDS,
+    image=settings.SANDBOX_IMAGE,
+    max_output=settings.TOOL_MAX_OUTPUT_BYTES
+)
+dev_toolkit = DevToolkit(root_path, process_runner, sandbox_pool)
+code_index = CodeIndex(
+    root_path,
+    settings.CODE_INDEX_PATH or os.path.join(settings.DATA_DIR, "code_index.db"),
+    max_file_kb=settings.CODE_INDEX_MAX_FILE_KB
+)
+
+# Tools a hedged attempt may run while other attempts race it; any other tool call commits the run
+READ_ONLY_TOOLS = {"read_file", "list_files", "read_file_lines", "read_file_bytes", "search_in_file", "find_symbol", "search_code"}
 
 def create_agent(persona: str = None):
     """Creates a fresh PydanticAI Agent with the given persona."""
@@ -66,29 +223,60 @@ def create_agent(persona: str = None):
 
     # Register Tools
     @agent.tool
-    def run_command(ctx: RunContext[None], command: str) -> str:
+    async def run_command(ctx: RunContext[None], command: str) -> str:
         """Executa um comando no terminal do sistema."""
-        return terminal.execute(command)
+        return await terminal.execute(command)
 
     @agent.tool
-    def read_file(ctx: RunContext[None], path: str) -> str:
+    async def read_file(ctx: RunContext[None], path: str) -> str:
         """Lê o conteúdo de um arquivo."""
-        return editor.read_file(path)
+        return await editor.read_file(path)
 
     @agent.tool
-    def write_file(ctx: RunContext[None], path: str, content: str) -> str:
+    async def write_file(ctx: RunContext[None], path: str, content: str) -> str:
         """Escreve conteúdo em um arquivo."""
-        return editor.write_file(path, content)
+        return await editor.write_file(path, content)
 
     @agent.tool
-    def list_files(ctx: RunContext[None], directory: str = ".") -> str:
+    async def list_files(ctx: RunContext[None], directory: str = ".") -> str:
         """Lista arquivos em um diretório."""
-        return editor.list_files(directory)
+        return await editor.list_files(directory)
+
+    @agent.tool
+    async def read_file_lines(ctx: RunContext[None], path: str, start_line: int = 1, end_line: int = None) -> str:
+        """Lê apenas um intervalo de linhas (numeradas) de um arquivo. Prefira para arquivos grandes e logs."""
+        return await editor.read_range(path, start_line, end_line)
 
     @agent.tool
-    def python_sandbox(ctx: RunContext[None], code: str) -> str:
+    async def read_file_bytes(ctx: RunContext[None], path: str, offset: int = 0, length: int = 4096) -> str:
+        """Lê `length` bytes a partir de `offset`. Use para arquivos sem quebras de linha (JSON minificado, binários)."""
+        return await editor.read_bytes(path, offset, length)
+
+    @agent.tool
+    async def search_in_file(ctx: RunContext[None], path: str, pattern: str, context: int = 2) -> str:
+        """Busca uma regex em um arquivo e retorna as linhas numeradas ao redor de cada ocorrência."""
+        return await editor.search(path, pattern, context)
+
+    @agent.tool
+    async def apply_patch(ctx: RunContext[None], path: str, diff: str) -> str:
+        """Aplica um diff unificado (hunks @@) a um arquivo, sem reescrevê-lo inteiro. Tudo ou nada."""
+        return await editor.apply_patch(path, diff)
+
+    if settings.CODE_INDEX_ENABLED:
+        @agent.tool
+        async def find_symbol(ctx: RunContext[None], name: str, kind: str = None) -> str:
+            """Localiza definições (classe, função, método, variável) e referências de um símbolo Python no workspace."""
+            return await asyncio.to_thread(code_index.find_symbol, name, kind)
+
+        @agent.tool
+        async def search_code(ctx: RunContext[None], query: str, path_glob: str = None) -> str:
+            """Busca texto em todo o workspace (índice local) e retorna trechos ranqueados com números de linha."""
+            return await asyncio.to_thread(code_index.search_code, query, 10, path_glob)
+
+    @agent.tool
+    async def python_sandbox(ctx: RunContext[None], code: str) -> str:
         """Executa código Python isolado para testes rápidos."""
-        return dev_toolkit.run_python_sandbox(code)
+        return await dev_toolkit.run_python_sandbox(code)
 
     @agent.tool
     def ask_antigravity(ctx: RunContext[None], question: str) -> str:
@@ -116,7 +304,8 @@ def create_agent(persona: str = None):
         with open(os.path.join(skill_dir, "main.py"), "w") as f:
             f.write(python_code)
             
-        skills_engine.refresh_cache()
+        # Parses just this skill; it is imported on its first call
+        skills_engine.refresh_skill(skill_name)
         return f"✅ Habilidade '{skill_name}' criada com sucesso e pronta para uso imediato (Engine Refreshed)."
 
     # --- Dynamic Skills Registration (OpenClaw Hub Style) ---
@@ -126,23 +315,385 @@ def create_agent(persona: str = None):
         
     return agent
 
+class AgentPool:
+    """
+    Bounded LRU pool of ready-made agents, keyed by persona, the content hash of its
+    system prompt and the skills-cache version. A persona switch becomes a dict lookup
+    instead of a full agent build, and editing one persona file only rebuilds that persona.
+    """
+    def __init__(self, max_size: int = 8):
+        self.max_size = max(1, max_size)
+        self.agents = OrderedDict()
+        self.versions = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, persona: str = "default") -> Agent:
+        # clear_brain_cache() and skills_engine.refresh_cache() bump these versions
+        versions = (get_cache_version(), skills_engine.version)
+        if versions != self.versions:
+            self.invalidate()
+            self.versions = versions
+
+        prompt_version = get_prompt_version(root_path, persona if persona != "default" else None)
+        key = (persona, prompt_version, skills_engine.version)
+        agent = self.agents.get(key)
+        if agent is not None:
+            self.agents.move_to_end(key)
+            self.hits += 1
+            return agent
+
+        self.misses += 1
+        # Drop outdated builds of the same persona right away instead of waiting for LRU eviction
+        for stale in [k for k in self.agents if k[0] == persona]:
+            del self.agents[stale]
+        agent = create_agent(persona if persona != "default" else None)
+        self.agents[key] = agent
+        while len(self.agents) > self.max_size:
+            self.agents.popitem(last=False)
+            self.evictions += 1
+        return agent
+
+    def invalidate(self):
+        """Drops every pooled agent; they are rebuilt lazily on the next request."""
+        if self.agents:
+            logger.info(f"[♻️] Agent pool invalidated ({len(self.agents)} agents dropped).")
+        self.agents.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self.agents),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
+
+agent_pool = AgentPool(max_size=settings.AGENT_POOL_SIZE)
+
+def event_fields(session: SessionContext, started: float, result=None) -> dict:
+    """Structured evolution log fields for one attempt: latency, persona, user and token usage."""
+    fields = {
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        "persona": session.persona,
+        "user_id": session.user_id
+    }
+    if result is not None:
+        try:
+            usage = result.usage()
+            fields["input_tokens"] = getattr(usage, "input_tokens", None) or getattr(usage, "request_tokens", None)
+            fields["output_tokens"] = getattr(usage, "output_tokens", None) or getattr(usage, "response_tokens", None)
+        except Exception:
+            pass
+    return fields
+
 class Orchestrator:
     def __init__(self):
-        self.current_persona = "default"
-        self.active_agent = create_agent()
+        # Warm the pool so the first request doesn't pay for an agent build
+        agent_pool.get("default")
+        # Rolling window of successful attempt latencies, feeds the p95 hedge delay
+        self.latencies = deque(maxlen=200)
+        self.routing = ([], [])
+        if settings.ROUTING_TABLE_ENABLED:
+            self.load_routing_table()
         logger.info("[🛸] Orchestrator initialized with OpenClaw Execution Engine.")
 
+    def load_routing_table(self, path: str = None):
+        """Loads the measured route ranking exported by `python analytics.py export`."""
+        path = path or settings.ROUTING_TABLE_PATH or os.path.join(settings.DATA_DIR, "routing_table.json")
+        self.routing = load_routing_table(path)
+        ranked, demoted = self.routing
+        if ranked or demoted:
+            logger.info(f"[📊] Routing table loaded: {len(ranked)} ranked, {len(demoted)} demoted routes.")
+
+    def _route_order(self) -> list:
+        """(provider, model_id) pairs: MODEL_PRIORITY order, reordered by the routing table, then by live data."""
+        routes = []
+        for provider in settings.MODEL_PRIORITY.split(","):
+            # For Gemini, try rotation
+            model_ids = GEMINI_ROTATION_MODELS if provider == "gemini" else [None]
+            routes += [(provider, m_id or "default") for m_id in model_ids]
+        return model_router.rank(order_routes(routes, *self.routing))
+
+    def _provider_candidates(self, failures: list):
+        """
+        Lazily yields (provider, model_id, model) in rotation order, skipping unconfigured
+        providers and routes whose circuit breaker is open.
+        """
+        skipped = []
+        for provider, m_id in self._route_order():
+            model = get_model_instance(provider, model_id=None if m_id == "default" else m_id)
+            if not model:
+                continue
+            if not circuit_breakers.allow(provider, m_id):
+                skipped.append(f"{provider}:{m_id}")
+                continue
+            yield provider, m_id, model
+        if skipped:
+            logger.debug(f"[🔌] Skipped open circuits: {', '.join(skipped)}")
+            failures.append(f"Circuit breaker aberto (ignorados): {', '.join(skipped)}")
+
+    def _hedge_delay(self) -> float:
+        """Seconds to wait on a running attempt before racing the next provider against it."""
+        if settings.HEDGE_DELAY_MODE == "p95" and len(self.latencies) >= 20:
+            ordered = sorted(self.latencies)
+            return ordered[int(len(ordered) * 0.95) - 1]
+        return settings.HEDGE_DELAY_SECONDS
+
+    async def _run_attempt(self, session: SessionContext, message: str, provider: str, m_id: str, model, claim=None):
+        """
+        One provider attempt. With `claim` (hedged runs) the agent is driven node by node and
+        claim() is awaited before the first tool call that isn't in READ_ONLY_TOOLS.
+        """
+        started = time.perf_counter()
+        try:
+            if claim is None:
+                result = await session.agent.run(message, model=model, message_history=session.context())
+            else:
+                async with session.agent.iter(message, model=model, message_history=session.context()) as run:
+                    async for node in run:
+                        if Agent.is_call_tools_node(node) and any(
+                            isinstance(part, ToolCallPart) and part.tool_name not in READ_ONLY_TOOLS
+                            for part in node.model_response.parts
+                        ):
+                            await claim()
+                result = run.result
+        except Exception as e:
+            evolution_logger.log_event(
+                provider, m_id, "FAILURE", error=f"{type(e).__name__}: {str(e)[:120]}",
+                **event_fields(session, started)
+            )
+            raise
+        self.latencies.append(time.perf_counter() - started)
+        evolution_logger.log_event(provider, m_id, "SUCCESS", **event_fields(session, started, result))
+        return result
+
+    async def _run_sequential(self, session: SessionContext, message: str, candidates, failures: list):
+        """Classic rotation: one provider at a time, the next only after the previous fails."""
+        for provider, m_id, model in candidates:
+            try:
+                logger.debug(f"[*] Executing via {provider}:{m_id}")
+                result = await self._run_attempt(session, message, provider, m_id, model)
+                return provider, m_id, result
+            except Exception as e:
+                failures.append(f"{provider}:{m_id}: {str(e)[:40]}...")
+        return None
+
+    async def _run_hedged(self, session: SessionContext, message: str, candidates, failures: list):
+        """
+        Hedged rotation: if an attempt hasn't finished after the hedge delay, the next provider
+        is started alongside it. The first successful result wins and the rest are cancelled,
+        so nothing but the winner's messages ever reaches the MemoryStore.
+        Cancelling can't undo a write or a command, so attempts race only while they read: the
+        first one to call a side-effecting tool commits the run, the others are cancelled and no
+        new attempt is hedged against it. If the committed attempt fails, the rotation goes on.
+        """
+        candidates = iter(candidates)
+        running = {}
+        committed = None
+
+        async def claim():
+            nonlocal committed
+            task = asyncio.current_task()
+            if committed is None:
+                committed = task
+                provider, m_id = running[task]
+                others = [t for t in running if t is not task]
+                for other in others:
+                    other.cancel()
+                logger.info(f"[⚡] {provider}:{m_id} called a side-effecting tool, hedging stopped ({len(others)} attempt(s) cancelled).")
+            elif committed is not task:
+                # Another attempt already committed; this one is being cancelled
+                await asyncio.Future()
+
+        def launch_next() -> bool:
+            candidate = next(candidates, None)
+            if candidate is None:
+                return False
+            provider, m_id, model = candidate
+            logger.debug(f"[*] Hedged attempt via {provider}:{m_id}")
+            task = asyncio.create_task(self._run_attempt(session, message, provider, m_id, model, claim))
+            running[task] = (provider, m_id)
+            return True
+
+        exhausted = not launch_next()
+        try:
+            while running:
+                done, _ = await asyncio.wait(
+                    running,
+                    timeout=None if exhausted or committed else self._hedge_delay(),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # Current attempts are slow: race the next provider against them (unless one committed meanwhile)
+                    if not committed:
+                        exhausted = not launch_next()
+                    continue
+
+                for task in done:
+                    provider, m_id = running.pop(task)
+                    if task.cancelled():
+                        continue
+                    if task.exception() is None:
+                        if running:
+                            logger.info(f"[⚡] Hedged race won by {provider}:{m_id}, cancelling {len(running)} slower attempt(s).")
+                        return provider, m_id, task.result()
+                    failures.append(f"{provider}:{m_id}: {str(task.exception())[:40]}...")
+                    if task is committed:
+                        committed = None
+
+                # A failure shouldn't wait for the hedge delay, take its slot right away
+                if not exhausted and not committed:
+                    exhausted = not launch_next()
+            return None
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+    async def _stream_attempt(self, session: SessionContext, message: str, model, outcome: dict):
+        """Runs the agent node by node, yielding text deltas and tool events as they are produced."""
+        started = time.perf_counter()
+        async with session.agent.iter(message, model=model, message_history=session.context()) as run:
+            async for node in run:
+                if Agent.is_model_request_node(node):
+                    async with node.stream(run.ctx) as request_stream:
+                        async for event in request_stream:
+                            if isinstance(event, PartStartEvent) and isinstance(event.part, TextPart) and event.part.content:
+                                yield {"type": "token", "content": event.part.content}
+                            elif isinstance(event, PartDeltaEvent) and isinstance(event.delta, TextPartDelta):
+                                yield {"type": "token", "content": event.delta.content_delta}
+                elif Agent.is_call_tools_node(node):
+                    async with node.stream(run.ctx) as handle_stream:
+                        async for event in handle_stream:
+                            if isinstance(event, FunctionToolCallEvent):
+                                yield {"type": "tool_call", "tool": event.part.tool_name, "args": event.part.args}
+                            elif isinstance(event, FunctionToolResultEvent):
+                                yield {"type": "tool_result", "tool": event.result.tool_name, "content": str(event.result.content)[:500]}
+        self.latencies.append(time.perf_counter() - started)
+        outcome["result"] = run.result
+
     async def process_message(self, message: str, user_id: str = "default_user") -> str:
-        async with lane_manager.get_lock(user_id):
+        async with lane_manager.hold(user_id):
             return await self._process_logic(message, user_id)
 
+    async def stream_message(self, message: str, user_id: str = "default_user"):
+        """
+        Streaming twin of process_message. Yields event dicts (token, tool_call, tool_result,
+        retry, done) while the run progresses; history is committed only once a run completes.
+        A 'retry' event means the partial output streamed so far must be discarded.
+        """
+        async with lane_manager.hold(user_id):
+            session = self._prepare_session(message, user_id)
+            failures = []
+
+            fingerprint = history_fingerprint(session.history)
+            cached = self._cached_response(session, message, fingerprint)
+            if cached is not None:
+                yield {"type": "token", "content": cached}
+                yield {"type": "done", "provider": "cache", "response": cached}
+                return
+
+            # --- PHASE 1: API GATEWAY (streamed, sequential rotation) ---
+            for provider, m_id, model in self._provider_candidates(failures):
+                outcome = {}
+                emitted = False
+                started = time.perf_counter()
+                try:
+                    logger.debug(f"[*] Streaming via {provider}:{m_id}")
+                    async for event in self._stream_attempt(session, message, model, outcome):
+                        emitted = True
+                        yield event
+                except Exception as e:
+                    evolution_logger.log_event(
+                        provider, m_id, "FAILURE", error=f"{type(e).__name__}: {str(e)[:120]}",
+                        **event_fields(session, started)
+                    )
+                    failures.append(f"{provider}:{m_id}: {str(e)[:40]}...")
+                    if emitted:
+                        yield {"type": "retry", "provider": f"{provider}:{m_id}"}
+                    continue
+
+                result = outcome["result"]
+                self._cache_response(session, message, fingerprint, result.output, result.new_messages())
+                memory_store.add_interaction(user_id, result.new_messages())
+                evolution_logger.log_event(provider, m_id, "SUCCESS", **event_fields(session, started, result))
+                yield {"type": "done", "provider": f"{provider}:{m_id}", "response": result.output}
+                return
+
+            # --- PHASE 2: Browser Ghost, forwarding the answer as the page renders it ---
+            partials = asyncio.Queue()
+            browser = asyncio.ensure_future(self._run_browser(session, message, user_id, failures, on_partial=partials.put_nowait))
+            browser.add_done_callback(lambda _: partials.put_nowait(None))
+            streamed = ""
+            try:
+                while (text := await partials.get()) is not None:
+                    for event in self._partial_events(streamed, text, "browser:chatgpt"):
+                        yield event
+                    streamed = text
+                response = browser.result()
+            finally:
+                if not browser.done():
+                    browser.cancel()
+            source = "browser:chatgpt"
+
+            # --- PHASE 3: Neural Bridge (delivered as a single chunk) ---
+            if response is None:
+                response = self._handoff_to_bridge(message, failures)
+                source = "bridge"
+            for event in self._partial_events(streamed, response, source):
+                yield event
+            yield {"type": "done", "provider": source, "response": response}
+
+    def _partial_events(self, streamed: str, text: str, source: str) -> list:
+        """Token events turning the already streamed text into `text` (a retry if it was rewritten)."""
+        if text.startswith(streamed):
+            delta = text[len(streamed):]
+            return [{"type": "token", "content": delta}] if delta else []
+        return [{"type": "retry", "provider": source}, {"type": "token", "content": text}]
+
+    def _cached_response(self, session: SessionContext, message: str, fingerprint: str):
+        """Serves a cached answer (recording it in the session history) or returns None."""
+        if not settings.RESPONSE_CACHE_ENABLED:
+            return None
+        entry = response_cache.lookup(message, session.persona, fingerprint)
+        if entry is None:
+            return None
+        logger.info(f"[⚡] Response cache hit for {session.user_id} ({session.persona}).")
+        # The caller's own question plus the cached answer: never the original asker's messages
+        memory_store.add_interaction(session.user_id, [
+            ModelRequest(parts=[UserPromptPart(content=message)]),
+            ModelResponse(parts=[TextPart(content=entry.response)])
+        ])
+        return entry.response
+
+    def _cache_response(self, session: SessionContext, message: str, fingerprint: str, response: str, messages: list):
+        if settings.RESPONSE_CACHE_ENABLED:
+            response_cache.store(message, session.persona, fingerprint, response, messages)
+
+    def _prepare_session(self, message: str, user_id: str) -> SessionContext:
+        session = memory_store.get_session(user_id)
+
+        # Persona Detection (scoped to this session, other lanes keep their own agent)
+        persona = detect_best_persona(message) or "default"
+        if persona != session.persona:
+            logger.info(f"[*] Switching {user_id} to specialized persona: {persona}")
+            session.persona = persona
+        session.agent = agent_pool.get(persona)
+        return session
+
     async def _process_logic(self, message: str, user_id: str) -> str:
         # 1. Persona Detection
-        persona = detect_best_persona(message) or "default"
-        if persona != self.current_persona:
-            logger.info(f"[*] Switching to specialized persona: {persona}")
-            self.active_agent = create_agent(persona if persona != "default" else None)
-            self.current_persona = persona
+        session = self._prepare_session(message, user_id)
+
+        fingerprint = history_fingerprint(session.history)
+        cached = self._cached_response(session, message, fingerprint)
+        if cached is not None:
+            return cached
         
         # 2. Strategy Choice: Complex Architecture vs Standard Task
         complexity_keywords = ["arquitetura", "refatore o core", "integracao complexa", "antigravity"]
@@ -154,53 +705,43 @@ class Orchestrator:
         failures = []
         
         # --- PHASE 1: API GATEWAY (Multi-Provider) ---
-        priority_providers = settings.MODEL_PRIORITY.split(",")
-        
-        for provider in priority_providers:
-            # For Gemini, try rotation
-            if provider == "gemini":
-                for m_id in GEMINI_ROTATION_MODELS:
-                    try:
-                        model = get_model_instance("gemini", model_id=m_id)
-                        if not model: continue
-                        logger.debug(f"[*] Executing via {provider}:{m_id}")
-                        
-                        history = memory_store.get_history(user_id)
-                        result = await self.active_agent.run(message, model=model, message_history=history)
-                        
-                        memory_store.add_interaction(user_id, result.new_messages())
-                        evolution_logger.log_event(provider, m_id, "SUCCESS")
-                        return result.data
-                    except Exception as e:
-                        failures.append(f"{provider}:{m_id}: {str(e)[:40]}...")
-            else:
-                try:
-                    model = get_model_instance(provider)
-                    if not model: continue
-                    logger.debug(f"[*] Executing via {provider}")
-                    
-                    history = memory_store.get_history(user_id)
-                    result = await self.active_agent.run(message, model=model, message_history=history)
-                    
-                    memory_store.add_interaction(user_id, result.new_messages())
-                    evolution_logger.log_event(provider, "default", "SUCCESS")
-                    return result.data
-                except Exception as e:
-                    failures.append(f"{provider}: {str(e)[:40]}...")
+        candidates = self._provider_candidates(failures)
+        if settings.HEDGED_EXECUTION:
+            winner = await self._run_hedged(session, message, candidates, failures)
+        else:
+            winner = await self._run_sequential(session, message, candidates, failures)
+
+        if winner:
+            provider, m_id, result = winner
+            self._cache_response(session, message, fingerprint, result.output, result.new_messages())
+            memory_store.add_interaction(user_id, result.new_messages())
+            return result.output
         
         # --- PHASE 2: BROWSER GHOST (ChatGPT) ---
+        response = await self._run_browser(session, message, user_id, failures)
+        if response is not None:
+            return response
+
+        # --- PHASE 3: NEURAL BRIDGE (Final Handoff) ---
+        return self._handoff_to_bridge(message, failures)
+
+    async def _run_browser(self, session: SessionContext, message: str, user_id: str, failures: list, on_partial=None):
+        """Browser Ghost fallback. Returns the response, or None after recording the failure."""
+        if not circuit_breakers.allow("browser", "chatgpt"):
+            failures.append("Browser: circuit breaker aberto (ignorado)")
+            return None
+
+        started = time.perf_counter()
         try:
             logger.info("[*] API levels depleted. Activating Browser Ghost Mode...")
             
-            history = memory_store.get_history(user_id)
-            # If no history, we send the system prompt as a "setup" message
-            if not history:
-                system_prompt = get_integrated_system_prompt(root_path, active_persona=persona)
-                contextual_message = f"Roleplay/Instructions (DO NOT REPEAT, JUST COMPLY):\n{system_prompt}\n\nUser Question: {message}"
-            else:
-                contextual_message = message
+            # The system prompt only goes out when the browser has to start a new ChatGPT thread
+            system_prompt = get_integrated_system_prompt(root_path, active_persona=session.persona)
+            preamble = f"Roleplay/Instructions (DO NOT REPEAT, JUST COMPLY):\n{system_prompt}"
             
-            response = await browser_model.generate_response(contextual_message, service="chatgpt", user_id=user_id)
+            response = await browser_model.generate_response(
+                message, service="chatgpt", user_id=user_id, on_partial=on_partial, context_preamble=preamble
+            )
             
             if "Erro" not in response:
                 # Add to memory store (manual since browser doesn't return new_messages easily)
@@ -208,14 +749,23 @@ class Orchestrator:
                     {"role": "user", "content": message},
                     {"role": "assistant", "content": response}
                 ])
-                evolution_logger.log_event("browser", "chatgpt", "SUCCESS")
+                evolution_logger.log_event("browser", "chatgpt", "SUCCESS", **event_fields(session, started))
                 return response
+            evolution_logger.log_event(
+                "browser", "chatgpt", "FAILURE", error=response[:120], error_class="BrowserError",
+                **event_fields(session, started)
+            )
             failures.append(f"Browser: {response[:50]}...")
         except Exception as e:
             logger.error(f"[!] Browser Ghost Mode failed: {e}")
+            evolution_logger.log_event(
+                "browser", "chatgpt", "FAILURE", error=f"{type(e).__name__}: {str(e)[:120]}",
+                **event_fields(session, started)
+            )
             failures.append(f"Browser: {str(e)[:50]}...")
+        return None
 
-        # --- PHASE 3: NEURAL BRIDGE (Final Handoff) ---
+    def _handoff_to_bridge(self, message: str, failures: list) -> str:
         logger.info("[*] All local autonomous models failed. Handing off to Antigravity Bridge.")
         bridge_msg = (
             f"❌ **Ronaldinho em modo de espera**: As APIs e o Browser não conseguiram processar sua mensagem.\n\n"
@@ -0,0 +1,191 @@
+import re
+import math
+import time
+import zlib
+import hashlib
+import logging
+import unicodedata
+from collections import OrderedDict
+from pydantic_ai.messages import ModelResponse, ToolCallPart
+from config import settings
+from memory import message_text, split_turns
+
+logger = logging.getLogger("response-cache")
+
+VECTOR_DIMS = 1024
+OPERATOR_CHARS = set("+-*/=<>^%")
+EDGE_PUNCTUATION = ".,;:!?\"'()[]{}"
+
+def normalize(text: str) -> str:
+    """Lowercase, accent-free, punctuation-free form so trivially different phrasings collide."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+def anchors(text: str) -> tuple:
+    """
+    Tokens of the raw message that a cached answer must repeat verbatim: anything with a digit,
+    bare operators and capitalised names (not at the start of a sentence). normalize() and the
+    embedding blur exactly these, so "quanto é 2+2" and "quanto é 2+3" must not share an answer.
+    """
+    found = []
+    sentence_start = True
+    for token in text.split():
+        word = token.strip(EDGE_PUNCTUATION)
+        if any(c.isdigit() for c in word) or (word and set(word) <= OPERATOR_CHARS):
+            found.append(word)
+        elif word[:1].isupper() and not sentence_start:
+            found.append(word)
+        sentence_start = token.endswith((".", "!", "?"))
+    return tuple(found)
+
+def embed(text: str) -> dict:
+    """
+    Local embedding: hashed word and character-trigram features, L2-normalized.
+    Sparse {dimension: weight} dict, no model or external service involved.
+    """
+    features = {}
+    for word in text.split():
+        dim = zlib.crc32(word.encode()) % VECTOR_DIMS
+        features[dim] = features.get(dim, 0) + 2.0
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            dim = zlib.crc32(padded[i:i + 3].encode()) % VECTOR_DIMS
+            features[dim] = features.get(dim, 0) + 1.0
+    norm = math.sqrt(sum(v * v for v in features.values())) or 1.0
+    return {dim: v / norm for dim, v in features.items()}
+
+def cosine(a: dict, b: dict) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(dim, 0.0) for dim, v in a.items())
+
+def history_fingerprint(history: list) -> str:
+    """
+    Fingerprint of the context a question answers to: the last turn's user prompt and its final
+    reply together, so a common reply such as "ok" alone doesn't make two sessions collide.
+    """
+    if not history:
+        return ""
+    turn = split_turns(history)[-1]
+    context = f"{normalize(message_text(turn[0]))}|{normalize(message_text(turn[-1]))}"
+    return hashlib.sha1(context.encode()).hexdigest()[:16]
+
+def uses_tools(messages: list) -> bool:
+    return any(
+        isinstance(m, ModelResponse) and any(isinstance(p, ToolCallPart) for p in m.parts)
+        for m in messages
+    )
+
+class CacheEntry:
+    def __init__(self, scope: tuple, normalized: str, anchors: tuple, vector: dict, response: str):
+        self.scope = scope
+        self.normalized = normalized
+        self.anchors = anchors
+        self.vector = vector
+        self.response = response
+        self.created_at = time.monotonic()
+
+class ResponseCache:
+    """
+    Opt-in response cache in front of the provider rotation.
+    Exact tier: normalized message + anchors + persona + history fingerprint.
+    Similarity tier: cosine over local embeddings, scoped to the same persona and fingerprint,
+    and only between messages whose anchors (numbers, operators, names) are identical.
+    Turns that used tools are never cached (their answers depend on live side effects).
+    Only the answer text is kept: the asker's own messages never reach another session.
+    """
+    def __init__(self, ttl: float = 3600, max_entries: int = 2000, similarity: float = 0.9):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self.entries = OrderedDict()
+        self.scopes = {}
+        self.metrics = {"exact_hits": 0, "similar_hits": 0, "misses": 0, "stores": 0, "bypassed": 0}
+
+    def _key(self, scope: tuple, normalized: str, anchors: tuple) -> str:
+        return hashlib.sha1(f"{scope}|{normalized}|{anchors}".encode()).hexdigest()
+
+    def _drop(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry:
+            keys = self.scopes.get(entry.scope)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self.scopes[entry.scope]
+
+    def _alive(self, key: str):
+        entry = self.entries.get(key)
+        if entry and time.monotonic() - entry.created_at > self.ttl:
+            self._drop(key)
+            return None
+        return entry
+
+    def lookup(self, message: str, persona: str, fingerprint: str):
+        normalized = normalize(message)
+        if not normalized:
+            return None
+        scope = (persona, fingerprint)
+        message_anchors = anchors(message)
+
+        key = self._key(scope, normalized, message_anchors)
+        entry = self._alive(key)
+        if entry:
+            self.entries.move_to_end(key)
+            self.metrics["exact_hits"] += 1
+            return entry
+
+        vector = embed(normalized)
+        best, best_score = None, self.similarity
+        for candidate_key in list(self.scopes.get(scope, ())):
+            candidate = self._alive(candidate_key)
+            if candidate is None or candidate.anchors != message_anchors:
+                continue
+            score = cosine(vector, candidate.vector)
+            if score >= best_score:
+                best, best_score = candidate_key, score
+        if best:
+            self.entries.move_to_end(best)
+            self.metrics["similar_hits"] += 1
+            logger.debug(f"[⚡] Similar cache hit ({best_score:.2f}) for persona {persona}.")
+            return self.entries[best]
+
+        self.metrics["misses"] += 1
+        return None
+
+    def store(self, message: str, persona: str, fingerprint: str, response: str, messages: list):
+        normalized = normalize(message)
+        if not normalized or uses_tools(messages):
+            self.metrics["bypassed"] += 1
+            return
+        scope = (persona, fingerprint)
+        message_anchors = anchors(message)
+        key = self._key(scope, normalized, message_anchors)
+        self._drop(key)
+        self.entries[key] = CacheEntry(scope, normalized, message_anchors, embed(normalized), response)
+        self.scopes.setdefault(scope, set()).add(key)
+        self.metrics["stores"] += 1
+        while len(self.entries) > self.max_entries:
+            self._drop(next(iter(self.entries)))
+
+    def clear(self):
+        self.entries.clear()
+        self.scopes.clear()
+
+    def stats(self) -> dict:
+        hits = self.metrics["exact_hits"] + self.metrics["similar_hits"]
+        lookups = hits + self.metrics["misses"]
+        return {
+            "enabled": settings.RESPONSE_CACHE_ENABLED,
+            "size": len(self.entries),
+            **self.metrics,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0
+        }
+
+# Global Instance
+response_cache = ResponseCache(
+    ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    similarity=settings.RESPONSE_CACHE_SIMILARITY
+)
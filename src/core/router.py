@@ -0,0 +1,143 @@
+import time
+import random
+import logging
+from config import settings
+from evolution_logger import evolution_logger
+
+logger = logging.getLogger("model-router")
+
+PROBE_FAILED = 999.0 # benchmarker's "unreachable" latency
+FAILING_SUCCESS = 0.2 # success EWMA below which a route is ranked after the unmeasured ones
+
+class RouteEstimate:
+    """EWMA of successful-call latency and success rate for one provider:model route."""
+    def __init__(self):
+        self.latency_ms = None
+        self.success = 1.0
+        self.samples = 0
+        self.updated_at = 0.0
+
+    def observe(self, ok: bool, latency_ms: float, alpha: float):
+        self.samples += 1
+        self.updated_at = time.time()
+        self.success += alpha * ((1.0 if ok else 0.0) - self.success)
+        if ok and latency_ms is not None:
+            self.latency_ms = latency_ms if self.latency_ms is None else self.latency_ms + alpha * (latency_ms - self.latency_ms)
+
+    def cost(self):
+        """Expected time to a successful answer; None until a successful call was timed."""
+        if self.latency_ms is None:
+            return None
+        return self.latency_ms / max(self.success, 0.05)
+
+    def failing(self) -> bool:
+        """Tried but never succeeded, or the success rate has collapsed."""
+        return (self.samples > 0 and self.latency_ms is None) or self.success < FAILING_SUCCESS
+
+class AdaptiveRouter:
+    """
+    Re-ranks the provider rotation from live data: in-band EWMA latency/success per route
+    (fed by the evolution log) and periodic provider probes from the heartbeat.
+    Strategies:
+      off      - keep the static/routing-table order
+      greedy   - cheapest measured route first
+      epsilon  - greedy, but an `exploration` share of requests leads with another route
+      weighted - lead route drawn with probability ~ 1/cost, so slower routes keep some traffic
+    Only the lead route is randomized; the fallbacks behind it stay in cost order.
+    """
+    def __init__(self, strategy: str = "epsilon", alpha: float = 0.3, exploration: float = 0.1):
+        self.strategy = strategy
+        self.alpha = alpha
+        self.exploration = exploration
+        self.routes = {}
+        self.probes = {} # provider -> latency in seconds from benchmarker.get_latencies
+        self.probed_at = 0.0
+        self.metrics = {"ranked": 0, "explored": 0}
+
+    def on_event(self, provider, model_id, status, error=None, latency_ms=None, **fields):
+        """EvolutionLogger listener: every logged outcome updates the route's estimate."""
+        if status not in ("SUCCESS", "FAILURE"):
+            return
+        key = (provider, model_id or "default")
+        self.routes.setdefault(key, RouteEstimate()).observe(status == "SUCCESS", latency_ms, self.alpha)
+
+    def update_probes(self, latencies: dict):
+        self.probes = dict(latencies)
+        self.probed_at = time.time()
+        down = sorted(p for p, latency in latencies.items() if latency >= PROBE_FAILED)
+        logger.info(f"[📡] Provider probes updated ({len(latencies)} providers{', unreachable: ' + ', '.join(down) if down else ''}).")
+
+    def rank(self, routes: list) -> list:
+        """
+        Reorders (provider, model_id) routes given in their base order. Measured routes come first
+        by cost, unmeasured ones keep their base order (faster probe first), then failing routes
+        (only failures, or success near 0) by success rate, unreachable providers last.
+        """
+        if self.strategy == "off" or len(routes) < 2:
+            return routes
+        self.metrics["ranked"] += 1
+
+        def key(item):
+            position, route = item
+            probe = self.probes.get(route[0])
+            if probe is not None and probe >= PROBE_FAILED:
+                return (3, 0, position)
+            estimate = self.routes.get(route)
+            if estimate and estimate.failing():
+                return (2, -estimate.success, position)
+            cost = estimate.cost() if estimate else None
+            if cost is not None:
+                return (0, cost, position)
+            return (1, probe if probe is not None else PROBE_FAILED, position)
+
+        ordered = [route for _, route in sorted(enumerate(routes), key=key)]
+        lead = self._explore(ordered) if self.strategy in ("epsilon", "weighted") else 0
+        if lead:
+            self.metrics["explored"] += 1
+            ordered.insert(0, ordered.pop(lead))
+        return ordered
+
+    def _explore(self, ordered: list) -> int:
+        """Index of the route to lead with (0 keeps the greedy choice)."""
+        reachable = [i for i, route in enumerate(ordered) if self.probes.get(route[0], 0) < PROBE_FAILED]
+        if len(reachable) < 2:
+            return 0
+        if self.strategy == "epsilon":
+            return random.choice(reachable[1:]) if random.random() < self.exploration else 0
+
+        # weighted: unmeasured routes are weighted like the median measured one (optimistic enough to get tried),
+        # failing ones like the slowest
+        estimates = [self.routes.get(ordered[i]) for i in reachable]
+        costs = [e.cost() if e and not e.failing() else None for e in estimates]
+        known = sorted(c for c in costs if c is not None)
+        if not known:
+            return 0
+        median = known[len(known) // 2]
+        weights = [
+            1.0 / max(c if c is not None else known[-1] if e and e.failing() else median, 1.0)
+            for c, e in zip(costs, estimates)
+        ]
+        return random.choices(reachable, weights=weights)[0]
+
+    def snapshot(self) -> dict:
+        return {
+            "strategy": self.strategy,
+            "routes": {
+                f"{p}:{m}": {
+                    "latency_ms": round(e.latency_ms, 1) if e.latency_ms is not None else None,
+                    "success": round(e.success, 3),
+                    "samples": e.samples
+                } for (p, m), e in self.routes.items()
+            },
+            "probes": {p: round(latency, 3) for p, latency in self.probes.items()},
+            "probed_at": self.probed_at,
+            **self.metrics
+        }
+
+# Global Instance
+model_router = AdaptiveRouter(
+    strategy=settings.ROUTER_STRATEGY,
+    alpha=settings.ROUTER_EWMA_ALPHA,
+    exploration=settings.ROUTER_EXPLORATION
+)
+evolution_logger.add_listener(model_router.on_event)
@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import sqlite3
+import threading
+from pydantic_ai.messages import ModelMessagesTypeAdapter, SystemPromptPart
+
+logger = logging.getLogger("session-store")
+
+def serialize_messages(messages: list) -> list:
+    """JSON-safe form of a history that may mix PydanticAI messages and browser-style dicts."""
+    encoded = []
+    for message in messages:
+        if isinstance(message, dict):
+            encoded.append({"t": "dict", "v": message})
+        else:
+            encoded.append({"t": "model", "v": ModelMessagesTypeAdapter.dump_python([message], mode="json")[0]})
+    return encoded
+
+def deserialize_messages(encoded: list) -> list:
+    messages = []
+    for item in encoded:
+        if item["t"] == "dict":
+            messages.append(item["v"])
+        else:
+            messages.append(ModelMessagesTypeAdapter.validate_python([item["v"]])[0])
+    return messages
+
+class SessionBackend:
+    """
+    Storage contract for session state. State is a dict with persona, history,
+    summary and pinned keys; backends only ever see serializable data.
+    """
+    def load(self, user_id: str):
+        return None
+
+    def append(self, user_id: str, messages: list, persona: str):
+        pass
+
+    def checkpoint(self, user_id: str, state: dict):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+class InMemorySessionBackend(SessionBackend):
+    """No persistence: sessions live only as long as the process (legacy behaviour)."""
+
+class SQLiteSessionBackend(SessionBackend):
+    """
+    Append-only session log on SQLite/WAL. New messages are buffered and committed in
+    batches (size or interval), a checkpoint row snapshots a compacted session and prunes
+    everything older, and a session is rebuilt from its last checkpoint plus later appends.
+    """
+    def __init__(self, db_path: str, flush_batch: int = 32, flush_interval: float = 2.0):
+        self.db_path = db_path
+        self.flush_batch = max(1, flush_batch)
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.flush_scheduled = False
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL + WAL: fsync on checkpoints instead of every commit
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS session_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_session_log_user ON session_log(user_id, id)")
+        self.conn.commit()
+
+    def load(self, user_id: str):
+        self.flush()
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT kind, payload FROM session_log WHERE user_id = ? AND id >= COALESCE("
+                "(SELECT MAX(id) FROM session_log WHERE user_id = ? AND kind = 'checkpoint'), 0) ORDER BY id",
+                (user_id, user_id)
+            ).fetchall()
+        if not rows:
+            return None
+
+        state = {"persona": "default", "history": [], "summary": [], "pinned": []}
+        for kind, payload in rows:
+            data = json.loads(payload)
+            if kind == "checkpoint":
+                state["summary"] = data.get("summary", [])
+                state["pinned"] = [SystemPromptPart(content=c) for c in data.get("pinned", [])]
+                state["history"] = deserialize_messages(data.get("history", []))
+            else:
+                state["history"].extend(deserialize_messages(data.get("messages", [])))
+            state["persona"] = data.get("persona", state["persona"])
+        return state
+
+    def append(self, user_id: str, messages: list, persona: str):
+        payload = json.dumps({"persona": persona, "messages": serialize_messages(messages)}, ensure_ascii=False)
+        with self.lock:
+            self.pending.append((user_id, "append", payload, time.time()))
+            should_flush = len(self.pending) >= self.flush_batch
+        if should_flush:
+            self.flush()
+        else:
+            self._schedule_flush()
+
+    def checkpoint(self, user_id: str, state: dict):
+        payload = json.dumps({
+            "persona": state["persona"],
+            "summary": state["summary"],
+            "pinned": [p.content for p in state["pinned"]],
+            "history": serialize_messages(state["history"])
+        }, ensure_ascii=False)
+        self.flush()
+        with self.lock:
+            cursor = self.conn.execute(
+                "INSERT INTO session_log (user_id, kind, payload, created_at) VALUES (?, 'checkpoint', ?, ?)",
+                (user_id, payload, time.time())
+            )
+            self.conn.execute("DELETE FROM session_log WHERE user_id = ? AND id < ?", (user_id, cursor.lastrowid))
+            self.conn.commit()
+
+    def _schedule_flush(self):
+        if self.flush_scheduled:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        self.flush_scheduled = True
+        loop.call_later(self.flush_interval, self.flush)
+
+    def flush(self):
+        with self.lock:
+            self.flush_scheduled = False
+            if not self.pending:
+                return
+            rows, self.pending = self.pending, []
+            self.conn.executemany(
+                "INSERT INTO session_log (user_id, kind, payload, created_at) VALUES (?, ?, ?, ?)", rows
+            )
+            self.conn.commit()
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            self.conn.close()
+
+def create_session_backend(settings) -> SessionBackend:
+    if settings.SESSION_BACKEND == "sqlite":
+        db_path = settings.SESSION_DB_PATH or os.path.join(settings.DATA_DIR, "sessions.db")
+        try:
+            return SQLiteSessionBackend(db_path, settings.SESSION_FLUSH_BATCH, settings.SESSION_FLUSH_INTERVAL)
+        except Exception as e:
+            logger.error(f"[!] SQLite session store unavailable ({e}), falling back to in-memory sessions.")
+    return InMemorySessionBackend()
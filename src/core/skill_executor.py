@@ -0,0 +1,171 @@
+import os
+import sys
+import time
+import pickle
+import asyncio
+import logging
+from collections import deque
+from config import settings
+from skill_worker import FRAME
+
+logger = logging.getLogger("skill-executor")
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "skill_worker.py")
+
+class SkillExecutionError(Exception):
+    """A skill call failed inside its worker (exception, timeout or crash)."""
+
+class SkillWorker:
+    def __init__(self, process):
+        self.process = process
+        self.calls = 0
+        self.started_at = time.monotonic()
+
+    async def call(self, request: dict) -> dict:
+        data = pickle.dumps(request)
+        self.process.stdin.write(FRAME.pack(len(data)) + data)
+        await self.process.stdin.drain()
+        (size,) = FRAME.unpack(await self.process.stdout.readexactly(FRAME.size))
+        self.calls += 1
+        return pickle.loads(await self.process.stdout.readexactly(size))
+
+    def kill(self):
+        if self.process.returncode is None:
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+
+class SkillExecutor:
+    """
+    Pool of pre-warmed worker interpreters that run dynamic skills out of process.
+    A blocking or CPU-heavy skill only occupies its worker; timeouts, crashes and
+    rlimit kills (RLIMIT_AS / RLIMIT_CPU) replace the worker instead of the server.
+    """
+    def __init__(self, workers: int = 2, timeout: float = 60.0, memory_mb: int = 1024, cpu_seconds: int = 30):
+        self.size = max(1, workers)
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.cpu_seconds = cpu_seconds
+        self.idle = None
+        self.workers = set()
+        self.loop = None
+        self.start_lock = None
+        self.waiting = 0
+        self.wait_times = deque(maxlen=200)
+        self.metrics = {"calls": 0, "errors": 0, "timeouts": 0, "crashes": 0, "respawns": 0}
+
+    async def _spawn(self) -> SkillWorker:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, WORKER_SCRIPT, str(self.memory_mb),
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE
+        )
+        worker = SkillWorker(process)
+        self.workers.add(worker)
+        return worker
+
+    async def start(self):
+        """Spawns the pool on the running loop (again if the loop changed)."""
+        loop = asyncio.get_running_loop()
+        if self.loop is loop and self.idle is not None:
+            return
+        if self.start_lock is None or self.loop is not loop:
+            self.start_lock = asyncio.Lock()
+        async with self.start_lock:
+            if self.loop is loop and self.idle is not None:
+                return
+            for worker in self.workers:
+                worker.kill()
+            self.workers.clear()
+            self.loop = loop
+            self.idle = asyncio.Queue()
+            for _ in range(self.size):
+                self.idle.put_nowait(await self._spawn())
+            logger.info(f"[⚙️] Skill executor ready ({self.size} workers, {self.timeout:.0f}s timeout, {self.memory_mb}MB).")
+
+    async def _replace(self, worker: SkillWorker):
+        worker.kill()
+        self.workers.discard(worker)
+        try:
+            await worker.process.wait()
+        except Exception:
+            pass
+        self.metrics["respawns"] += 1
+        self.idle.put_nowait(await self._spawn())
+
+    async def run(self, script: str, digest: str, name: str, args: tuple = (), kwargs: dict = None, timeout: float = None):
+        """Runs `name` from the skill module at `script` in a worker and returns its result."""
+        await self.start()
+        request = {
+            "script": script, "digest": digest, "name": name,
+            "args": tuple(args), "kwargs": kwargs or {}, "cpu_seconds": self.cpu_seconds
+        }
+        timeout = timeout or self.timeout
+
+        self.waiting += 1
+        queued_at = time.monotonic()
+        try:
+            worker = await self.idle.get()
+        finally:
+            self.waiting -= 1
+        self.wait_times.append(time.monotonic() - queued_at)
+        self.metrics["calls"] += 1
+
+        try:
+            response = await asyncio.wait_for(worker.call(request), timeout)
+        except asyncio.TimeoutError:
+            self.metrics["timeouts"] += 1
+            logger.warning(f"[⏱️] Skill {name} timed out after {timeout:.0f}s, recycling its worker.")
+            await self._replace(worker)
+            raise SkillExecutionError(f"tempo limite de {timeout:.0f}s excedido")
+        except (asyncio.IncompleteReadError, BrokenPipeError, ConnectionResetError):
+            self.metrics["crashes"] += 1
+            try:
+                code = await asyncio.wait_for(worker.process.wait(), 1.0)
+            except asyncio.TimeoutError:
+                code = None
+            logger.error(f"[💥] Skill worker crashed running {name} (exit {code}), respawning.")
+            await self._replace(worker)
+            raise SkillExecutionError(f"o processo da skill foi encerrado (exit {code}, possível limite de CPU/memória)")
+        except asyncio.CancelledError:
+            # The caller gave up mid-call: the worker's state is unknown, replace it
+            asyncio.ensure_future(self._replace(worker))
+            raise
+
+        self.idle.put_nowait(worker)
+        if not response["ok"]:
+            self.metrics["errors"] += 1
+            raise SkillExecutionError(response["error"])
+        return response["result"]
+
+    async def close(self):
+        for worker in self.workers:
+            worker.kill()
+        for worker in self.workers:
+            try:
+                await worker.process.wait()
+            except Exception:
+                pass
+        self.workers.clear()
+        self.idle = None
+        self.loop = None
+
+    def stats(self) -> dict:
+        waits = sorted(self.wait_times)
+        return {
+            "mode": settings.SKILL_EXECUTOR,
+            "workers": len(self.workers),
+            "idle": self.idle.qsize() if self.idle is not None else 0,
+            "queue_depth": self.waiting,
+            **self.metrics,
+            "wait_ms_avg": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+            "wait_ms_p95": round(waits[max(0, int(len(waits) * 0.95) - 1)] * 1000, 1) if waits else 0.0
+        }
+
+# Global Instance
+skill_executor = SkillExecutor(
+    workers=settings.SKILL_WORKERS,
+    timeout=settings.SKILL_TIMEOUT_SECONDS,
+    memory_mb=settings.SKILL_MEMORY_LIMIT_MB,
+    cpu_seconds=settings.SKILL_CPU_LIMIT_SECONDS
+)
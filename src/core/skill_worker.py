@@ -0,0 +1,93 @@
+import os
+import sys
+import struct
+import pickle
+import asyncio
+import inspect
+import resource
+import traceback
+import importlib.util
+
+# Skill worker process, started and fed by skill_executor.SkillExecutor.
+# Protocol: length-prefixed pickle frames on stdin/stdout.
+#   request:  {"script", "digest", "name", "args", "kwargs", "cpu_seconds"}
+#   response: {"ok": True, "result": ...} or {"ok": False, "error": "..."}
+FRAME = struct.Struct(">I")
+
+def read_frame(stream):
+    header = stream.read(FRAME.size)
+    if len(header) < FRAME.size:
+        return None
+    (size,) = FRAME.unpack(header)
+    return pickle.loads(stream.read(size))
+
+def write_frame(stream, payload):
+    try:
+        data = pickle.dumps(payload)
+    except Exception:
+        # Unpicklable return values degrade to their text form
+        data = pickle.dumps({"ok": True, "result": str(payload.get("result"))})
+    stream.write(FRAME.pack(len(data)) + data)
+    stream.flush()
+
+def limit_cpu(seconds: int):
+    """RLIMIT_CPU is cumulative per process: move the soft limit to `seconds` past what was used so far."""
+    if seconds <= 0:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(usage.ru_utime + usage.ru_stime) + seconds
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+modules = {} # script -> (digest, module)
+
+def load_function(script: str, digest: str, name: str):
+    cached = modules.get(script)
+    if cached is None or cached[0] != digest:
+        module_name = os.path.basename(os.path.dirname(script))
+        spec = importlib.util.spec_from_file_location(module_name, script)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        cached = modules[script] = (digest, module)
+    return getattr(cached[1], name)
+
+def main():
+    memory_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+
+    # Keep the protocol channel private: anything a skill prints goes to stderr
+    channel = os.fdopen(os.dup(1), "wb")
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+    requests = sys.stdin.buffer
+
+    # Pre-warm the imports most skills share, then cap the address space
+    import pydantic_ai  # noqa: F401
+    if memory_mb > 0:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    while True:
+        request = read_frame(requests)
+        if request is None:
+            return
+        try:
+            limit_cpu(request.get("cpu_seconds", 0))
+            func = load_function(request["script"], request["digest"], request["name"])
+            result = func(*request["args"], **request["kwargs"])
+            if inspect.isawaitable(result):
+                result = asyncio.run(_await(result))
+            response = {"ok": True, "result": result}
+        except MemoryError:
+            response = {"ok": False, "error": "MemoryError: limite de memória da skill excedido"}
+        except Exception as e:
+            response = {"ok": False, "error": "".join(traceback.format_exception_only(type(e), e)).strip()}
+            traceback.print_exc()
+        write_frame(channel, response)
+
+async def _await(awaitable):
+    return await awaitable
+
+if __name__ == "__main__":
+    main()
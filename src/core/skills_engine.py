@@ -1,60 +1,294 @@
 import os
+import ast
+import typing
+import inspect
+import hashlib
 import logging
+import threading
 import importlib.util
+import pydantic_ai
 from typing import List, Callable, Any
-from pydantic_ai import RunContext
+from pydantic_ai import RunContext, ModelRetry
+from config import settings
+from skill_executor import skill_executor, SkillExecutionError
 
 logger = logging.getLogger("skills-engine")
 
+# Names a skill annotation may reference without importing the skill itself
+ANNOTATION_NAMESPACE = {
+    **{name: getattr(typing, name) for name in typing.__all__},
+    "str": str, "int": int, "float": float, "bool": bool, "bytes": bytes,
+    "list": list, "dict": dict, "tuple": tuple, "set": set, "None": None,
+    "RunContext": RunContext, "pydantic_ai": pydantic_ai,
+}
+
+def _resolve_annotation(node):
+    if node is None:
+        return inspect.Parameter.empty
+    try:
+        return eval(compile(ast.Expression(node), "<skill-annotation>", "eval"), {"__builtins__": {}}, ANNOTATION_NAMESPACE)
+    except Exception:
+        return Any
+
+def _literal_default(node):
+    try:
+        return ast.literal_eval(node)
+    except Exception:
+        return None
+
+def _is_tool_node(node, flagged: set) -> bool:
+    if node.name.startswith("_"):
+        return False
+    if node.name.endswith("_tool") or node.name in flagged:
+        return True
+    for decorator in node.decorator_list:
+        target = decorator.func if isinstance(decorator, ast.Call) else decorator
+        name = target.attr if isinstance(target, ast.Attribute) else getattr(target, "id", "")
+        if "tool" in name:
+            return True
+    return False
+
+class ToolSpec:
+    """Signature and docstring of a skill tool, read from the source AST."""
+    def __init__(self, node):
+        self.name = node.name
+        self.doc = ast.get_docstring(node)
+        self.is_async = isinstance(node, ast.AsyncFunctionDef)
+        self.annotations = {}
+
+        args = node.args
+        positional = args.posonlyargs + args.args
+        defaults = [inspect.Parameter.empty] * (len(positional) - len(args.defaults)) + [_literal_default(d) for d in args.defaults]
+        params = []
+        for i, (arg, default) in enumerate(zip(positional, defaults)):
+            kind = inspect.Parameter.POSITIONAL_ONLY if i < len(args.posonlyargs) else inspect.Parameter.POSITIONAL_OR_KEYWORD
+            params.append(self._param(arg, kind, default))
+        if args.vararg:
+            params.append(self._param(args.vararg, inspect.Parameter.VAR_POSITIONAL))
+        for arg, default in zip(args.kwonlyargs, args.kw_defaults):
+            default = inspect.Parameter.empty if default is None else _literal_default(default)
+            params.append(self._param(arg, inspect.Parameter.KEYWORD_ONLY, default))
+        if args.kwarg:
+            params.append(self._param(args.kwarg, inspect.Parameter.VAR_KEYWORD))
+
+        returns = _resolve_annotation(node.returns)
+        if returns is not inspect.Parameter.empty:
+            self.annotations["return"] = returns
+        self.signature = inspect.Signature(params, return_annotation=returns)
+        # What agents are built from: a change here requires rebuilding them, a body change does not
+        self.surface = (self.name, ast.dump(node.args), ast.dump(node.returns) if node.returns else "", self.doc, self.is_async)
+
+    def _param(self, arg, kind, default=inspect.Parameter.empty):
+        annotation = _resolve_annotation(arg.annotation)
+        if annotation is not inspect.Parameter.empty:
+            self.annotations[arg.arg] = annotation
+        return inspect.Parameter(arg.arg, kind, default=default, annotation=annotation)
+
+class SkillManifest:
+    """What the registry knows about a skill folder without importing it."""
+    def __init__(self, folder: str, script: str, stat, digest: str, tools: list):
+        self.folder = folder
+        self.script = script
+        self.stat_key = (stat.st_mtime_ns, stat.st_size)
+        self.digest = digest
+        self.tools = tools
+        self.surface = tuple(t.surface for t in tools)
+
 class SkillsEngine:
     """
     Dynamic skill discovery and registration system.
     Inspired by OpenClaw's modular tool loading.
+
+    Tool signatures come from each skill's AST (no import at discovery time); the
+    returned callables are proxies that import the skill module on first invocation.
+    Reloads are per skill and keyed on the source mtime and content hash.
+    With SKILL_EXECUTOR=process the call itself runs in a skill_executor worker.
     """
     def __init__(self, skills_dir: str):
         self.skills_dir = skills_dir
-        self.loaded_skills = {}
+        self.loaded_skills = {} # folder -> imported module
+        self.manifests = {} # folder -> SkillManifest
+        self.proxies = {} # folder -> [proxy callables]
         self.cached_tools = None
+        self.cached_folders = None
+        self.version = 0
+        self.lock = threading.RLock()
+
+    def list_skills(self) -> List[str]:
+        """Installed skill folders (cached until the next refresh)."""
+        if self.cached_folders is None:
+            if os.path.isdir(self.skills_dir):
+                self.cached_folders = sorted(
+                    d for d in os.listdir(self.skills_dir)
+                    if os.path.isdir(os.path.join(self.skills_dir, d))
+                )
+            else:
+                self.cached_folders = []
+        return self.cached_folders
 
     def discover_tools(self) -> List[Callable]:
         """
-        Scans the skills directory for Python-based skills and returns 
-        the callables ready for PydanticAI. (Cached for speed)
+        Returns lazy proxies for every skill tool, ready for PydanticAI.
+        Only parses sources; no skill module is imported here. (Cached for speed)
         """
         if self.cached_tools is not None:
             return self.cached_tools
 
+        with self.lock:
+            for skill_folder in self.list_skills():
+                if skill_folder not in self.manifests:
+                    self._scan(skill_folder)
+            self.cached_tools = [tool for folder in sorted(self.proxies) for tool in self.proxies[folder]]
+        return self.cached_tools
+
+    def _scan(self, skill_folder: str) -> bool:
+        """(Re)builds one skill's manifest. Returns True if its tool surface changed."""
+        folder_path = os.path.join(self.skills_dir, skill_folder)
+        skill_script = os.path.join(folder_path, "main.py")
+        previous = self.manifests.get(skill_folder)
+
+        try:
+            stat = os.stat(skill_script)
+        except OSError:
+            self._forget(skill_folder)
+            return previous is not None and bool(previous.tools)
+
+        if previous and previous.stat_key == (stat.st_mtime_ns, stat.st_size):
+            return False
+
+        with open(skill_script, 'rb') as f:
+            source = f.read()
+        digest = hashlib.sha1(source).hexdigest()
+        if previous and previous.digest == digest:
+            # Touched but not edited: keep the loaded module
+            previous.stat_key = (stat.st_mtime_ns, stat.st_size)
+            return False
+
         tools = []
-        if not os.path.exists(self.skills_dir):
-            self.cached_tools = []
-            return tools
+        try:
+            tree = ast.parse(source, filename=skill_script)
+            # `fn.is_ai_tool = True` at module level flags a tool without the naming convention
+            flagged = {
+                target.value.id for node in tree.body if isinstance(node, ast.Assign)
+                for target in node.targets
+                if isinstance(target, ast.Attribute) and target.attr == "is_ai_tool" and isinstance(target.value, ast.Name)
+            }
+            for node in tree.body:
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and _is_tool_node(node, flagged):
+                    tools.append(ToolSpec(node))
+                    logger.info(f"[*] Skill Registry: {skill_folder}.{node.name}")
+        except Exception as e:
+            logger.error(f"[!] Failed to load skill {skill_folder}: {e}")
 
-        for skill_folder in os.listdir(self.skills_dir):
-            folder_path = os.path.join(self.skills_dir, skill_folder)
-            if not os.path.isdir(folder_path):
-                continue
-            
-            skill_script = os.path.join(folder_path, "main.py")
-            if os.path.exists(skill_script):
+        # New source: the next call imports it again
+        self.loaded_skills.pop(skill_folder, None)
+        manifest = SkillManifest(skill_folder, skill_script, stat, digest, tools)
+        self.manifests[skill_folder] = manifest
+        changed = previous is None or previous.surface != manifest.surface
+        if changed:
+            self.proxies[skill_folder] = [self._make_proxy(skill_folder, spec) for spec in tools]
+        return changed
+
+    def _forget(self, skill_folder: str):
+        self.manifests.pop(skill_folder, None)
+        self.proxies.pop(skill_folder, None)
+        self.loaded_skills.pop(skill_folder, None)
+
+    def _make_proxy(self, skill_folder: str, spec: ToolSpec) -> Callable:
+        engine = self
+        if settings.SKILL_EXECUTOR == "process":
+            async def proxy(*args, **kwargs):
+                return await engine.execute(skill_folder, spec.name, args, kwargs)
+        elif spec.is_async:
+            async def proxy(*args, **kwargs):
+                return await engine.resolve(skill_folder, spec.name)(*args, **kwargs)
+        else:
+            def proxy(*args, **kwargs):
+                return engine.resolve(skill_folder, spec.name)(*args, **kwargs)
+        proxy.__name__ = proxy.__qualname__ = spec.name
+        proxy.__doc__ = spec.doc
+        proxy.__signature__ = spec.signature
+        proxy.__annotations__ = spec.annotations
+        proxy.is_ai_tool = True
+        proxy.skill_name = skill_folder
+        return proxy
+
+    def resolve(self, skill_folder: str, name: str) -> Callable:
+        """Returns the real tool function, importing (or re-importing) its skill module on demand."""
+        with self.lock:
+            manifest = self._checked_manifest(skill_folder)
+            module = self.loaded_skills.get(skill_folder)
+            if module is None:
                 try:
-                    spec = importlib.util.spec_from_file_location(skill_folder, skill_script)
+                    spec = importlib.util.spec_from_file_location(skill_folder, manifest.script)
                     module = importlib.util.module_from_spec(spec)
                     spec.loader.exec_module(module)
-                    
-                    for name in dir(module):
-                        obj = getattr(module, name)
-                        if callable(obj) and (hasattr(obj, "is_ai_tool") or name.endswith("_tool")):
-                            tools.append(obj)
-                            logger.info(f"[*] Skill Registry: {skill_folder}.{name}")
                 except Exception as e:
                     logger.error(f"[!] Failed to load skill {skill_folder}: {e}")
-        
-        self.cached_tools = tools
-        return tools
+                    raise ModelRetry(f"A skill '{skill_folder}' falhou ao carregar: {e}")
+                self.loaded_skills[skill_folder] = module
+                logger.info(f"[*] Skill module loaded on first use: {skill_folder}")
+
+        func = getattr(module, name, None)
+        if not callable(func):
+            raise ModelRetry(f"A skill '{skill_folder}' não define mais a ferramenta '{name}'.")
+        return func
+
+    def _checked_manifest(self, skill_folder: str) -> SkillManifest:
+        manifest = self.manifests.get(skill_folder)
+        if manifest is None:
+            raise ModelRetry(f"A skill '{skill_folder}' não está mais instalada.")
+        # Cheap staleness check so edits apply even without the file watcher
+        try:
+            stat = os.stat(manifest.script)
+            if manifest.stat_key != (stat.st_mtime_ns, stat.st_size):
+                self.refresh_skill(skill_folder)
+        except OSError:
+            pass
+        return self.manifests.get(skill_folder, manifest)
+
+    async def execute(self, skill_folder: str, name: str, args: tuple, kwargs: dict):
+        """
+        Runs a tool in the out-of-process skill executor. The RunContext cannot cross the
+        process boundary, so a skill receives None in its place.
+        """
+        with self.lock:
+            manifest = self._checked_manifest(skill_folder)
+        args = tuple(None if isinstance(a, RunContext) else a for a in args)
+        kwargs = {k: None if isinstance(v, RunContext) else v for k, v in kwargs.items()}
+        try:
+            return await skill_executor.run(manifest.script, manifest.digest, name, args, kwargs)
+        except SkillExecutionError as e:
+            logger.error(f"[!] Skill {skill_folder}.{name} failed: {e}")
+            raise ModelRetry(f"A skill '{skill_folder}' falhou: {e}")
+
+    def refresh_skill(self, skill_folder: str):
+        """Rescans a single skill. Agents are only rebuilt if its tool signatures changed."""
+        with self.lock:
+            self.cached_folders = None
+            if self._scan(skill_folder):
+                self.cached_tools = None
+                self.version += 1
 
     def refresh_cache(self):
         """Clears cache to allow discovery of new skills."""
-        self.cached_tools = None
+        with self.lock:
+            self.manifests.clear()
+            self.proxies.clear()
+            self.loaded_skills.clear()
+            self.cached_tools = None
+            self.cached_folders = None
+            self.version += 1
+
+    def on_file_changed(self, path: str):
+        """File watcher hook: rescans only the skill folder the change belongs to (SKILL.md is read on demand)."""
+        relative = os.path.relpath(path, self.skills_dir)
+        if relative == "." or relative.startswith(".."):
+            return
+        skill_folder = relative.split(os.sep)[0]
+        if path.endswith(".py") or os.path.dirname(path) == self.skills_dir:
+            logger.info(f"[*] Skill change detected ({relative}), refreshing {skill_folder}.")
+            self.refresh_skill(skill_folder)
 
     def get_skills_instructions(self) -> str:
         """Loads all SKILL.md descriptions for the system prompt."""
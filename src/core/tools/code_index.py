@@ -0,0 +1,322 @@
+import os
+import ast
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from ignore_rules import SKIPPED_DIRS
+
+logger = logging.getLogger("code-index")
+
+INDEXED_EXTENSIONS = {
+    ".py", ".js", ".jsx", ".ts", ".tsx", ".mjs", ".json", ".md", ".toon", ".txt", ".toml", ".yaml",
+    ".yml", ".ini", ".cfg", ".html", ".css", ".scss", ".sh", ".sql", ".go", ".rs", ".java", ".c", ".h",
+    ".cpp", ".rb", ".php"
+}
+CHUNK_LINES = 40
+REFRESH_BATCH = 200 # files written per lock hold during a full refresh
+
+def should_index(relative_path: str) -> bool:
+    parts = relative_path.split(os.sep)
+    if any(p.startswith(".") or p in SKIPPED_DIRS for p in parts[:-1]):
+        return False
+    name = parts[-1]
+    if name == "Dockerfile":
+        return True
+    return not name.startswith(".") and os.path.splitext(name)[1].lower() in INDEXED_EXTENSIONS
+
+def python_symbols(source: str):
+    """Definitions (with qualified parents) and name references from a Python module's AST."""
+    tree = ast.parse(source)
+    definitions, references = [], set()
+
+    def visit(node, parent: str, in_class: bool = False):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                kind = "class" if isinstance(child, ast.ClassDef) else ("method" if in_class else "function")
+                if isinstance(child, ast.ClassDef):
+                    signature = f"class {child.name}"
+                else:
+                    prefix = "async def" if isinstance(child, ast.AsyncFunctionDef) else "def"
+                    signature = f"{prefix} {child.name}({ast.unparse(child.args)})"
+                definitions.append((child.name, kind, child.lineno, getattr(child, "end_lineno", child.lineno), parent, signature))
+                visit(child, f"{parent}.{child.name}" if parent else child.name, isinstance(child, ast.ClassDef))
+            elif isinstance(child, (ast.Assign, ast.AnnAssign)) and not parent:
+                targets = child.targets if isinstance(child, ast.Assign) else [child.target]
+                for target in targets:
+                    if isinstance(target, ast.Name):
+                        definitions.append((target.id, "variable", child.lineno, child.lineno, "", ast.unparse(child)[:120]))
+                visit(child, parent, in_class)
+            else:
+                if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Load):
+                    references.add((child.id, child.lineno))
+                elif isinstance(child, ast.Attribute):
+                    references.add((child.attr, child.lineno))
+                visit(child, parent, in_class)
+
+    visit(tree, "")
+    return definitions, sorted(references)
+
+def like_escape(text: str) -> str:
+    """Literal text for a LIKE pattern (used with ESCAPE '\\'): % and _ are wildcards otherwise."""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+class CodeIndex:
+    """
+    Persistent, incrementally maintained index of the workspace for the agent's code tools.
+    Full text: SQLite FTS5 with the trigram tokenizer over fixed-size line chunks (bm25-ranked,
+    substring-capable). Symbols: definitions and references extracted from Python ASTs.
+    Files are re-indexed only when their mtime/size change.
+    """
+    def __init__(self, root_path: str, db_path: str, max_file_kb: int = 512):
+        self.root_path = os.path.abspath(root_path)
+        self.db_path = db_path
+        self.max_file_bytes = max_file_kb * 1024
+        self.conn = None
+        self.lock = threading.RLock()
+        self.ready = False
+        self.dirty = set()
+        self.flush_handle = None
+        self.counts = {"files": 0, "symbols": 0} # refreshed after each commit, read lock-free by stats()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER);
+                CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5(path UNINDEXED, start_line UNINDEXED, body, tokenize='trigram');
+                CREATE TABLE IF NOT EXISTS symbols (path TEXT, name TEXT, kind TEXT, line INTEGER, end_line INTEGER, parent TEXT, signature TEXT);
+                CREATE INDEX IF NOT EXISTS idx_symbols_name ON symbols(name);
+                CREATE INDEX IF NOT EXISTS idx_symbols_path ON symbols(path);
+                CREATE TABLE IF NOT EXISTS refs (path TEXT, name TEXT, line INTEGER);
+                CREATE INDEX IF NOT EXISTS idx_refs_name ON refs(name);
+                CREATE INDEX IF NOT EXISTS idx_refs_path ON refs(path);
+            """)
+        return self.conn
+
+    # --- indexing ---
+    def _remove(self, conn, relative_path: str):
+        conn.execute("DELETE FROM files WHERE path = ?", (relative_path,))
+        conn.execute("DELETE FROM chunks WHERE path = ?", (relative_path,))
+        conn.execute("DELETE FROM symbols WHERE path = ?", (relative_path,))
+        conn.execute("DELETE FROM refs WHERE path = ?", (relative_path,))
+
+    def _index_file(self, conn, relative_path: str, stat) -> bool:
+        full_path = os.path.join(self.root_path, relative_path)
+        try:
+            with open(full_path, "r", encoding="utf-8") as f:
+                source = f.read()
+        except (UnicodeDecodeError, OSError):
+            self._remove(conn, relative_path)
+            return False
+
+        self._remove(conn, relative_path)
+        conn.execute("INSERT INTO files (path, mtime_ns, size) VALUES (?, ?, ?)", (relative_path, stat.st_mtime_ns, stat.st_size))
+        lines = source.split("\n")
+        conn.executemany(
+            "INSERT INTO chunks (path, start_line, body) VALUES (?, ?, ?)",
+            [(relative_path, i + 1, "\n".join(lines[i:i + CHUNK_LINES])) for i in range(0, len(lines), CHUNK_LINES)]
+        )
+        if relative_path.endswith(".py"):
+            try:
+                definitions, references = python_symbols(source)
+            except (SyntaxError, ValueError, RecursionError):
+                definitions, references = [], []
+            conn.executemany(
+                "INSERT INTO symbols (path, name, kind, line, end_line, parent, signature) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(relative_path, *d) for d in definitions]
+            )
+            conn.executemany("INSERT INTO refs (path, name, line) VALUES (?, ?, ?)", [(relative_path, *r) for r in references])
+        return True
+
+    def _walk(self):
+        for root, dirs, files in os.walk(self.root_path):
+            dirs[:] = [d for d in dirs if not d.startswith(".") and d not in SKIPPED_DIRS]
+            for name in files:
+                relative = os.path.relpath(os.path.join(root, name), self.root_path)
+                if should_index(relative):
+                    yield relative
+
+    def _update_counts(self, conn):
+        self.counts = {
+            "files": conn.execute("SELECT COUNT(*) FROM files").fetchone()[0],
+            "symbols": conn.execute("SELECT COUNT(*) FROM symbols").fetchone()[0]
+        }
+
+    def _write_batch(self, batch: list, counts: dict, removed=()):
+        with self.lock:
+            conn = self._connect()
+            for relative, stat in batch:
+                if self._index_file(conn, relative, stat):
+                    counts["indexed"] += 1
+            for relative in removed:
+                self._remove(conn, relative)
+                counts["removed"] += 1
+            conn.commit()
+            self._update_counts(conn)
+
+    def refresh(self) -> dict:
+        """
+        Full incremental pass: re-indexes changed files and drops deleted ones. The walk runs
+        unlocked and the lock is held only per batch write, so queries interleave with a cold start.
+        """
+        started = time.monotonic()
+        counts = {"indexed": 0, "removed": 0, "unchanged": 0}
+        with self.lock:
+            conn = self._connect()
+            known = {path: (mtime, size) for path, mtime, size in conn.execute("SELECT path, mtime_ns, size FROM files")}
+        seen, batch = set(), []
+        for relative in self._walk():
+            try:
+                stat = os.stat(os.path.join(self.root_path, relative))
+            except OSError:
+                continue
+            if stat.st_size > self.max_file_bytes:
+                continue
+            seen.add(relative)
+            if known.get(relative) == (stat.st_mtime_ns, stat.st_size):
+                counts["unchanged"] += 1
+                continue
+            batch.append((relative, stat))
+            if len(batch) >= REFRESH_BATCH:
+                self._write_batch(batch, counts)
+                batch = []
+        self._write_batch(batch, counts, removed=known.keys() - seen)
+        self.ready = True
+        logger.info(f"[🗂️] Code index refreshed in {time.monotonic() - started:.2f}s ({counts}).")
+        return counts
+
+    def update_paths(self, paths):
+        """Re-indexes (or drops) just the given absolute paths."""
+        with self.lock:
+            conn = self._connect()
+            for full_path in paths:
+                relative = os.path.relpath(full_path, self.root_path)
+                if relative.startswith("..") or not should_index(relative):
+                    continue
+                try:
+                    stat = os.stat(full_path)
+                except OSError:
+                    self._remove(conn, relative)
+                    continue
+                if stat.st_size > self.max_file_bytes:
+                    self._remove(conn, relative)
+                else:
+                    self._index_file(conn, relative, stat)
+            conn.commit()
+            self._update_counts(conn)
+
+    def on_file_changed(self, path: str):
+        """File watcher hook: batches changes and re-indexes them off the event loop."""
+        relative = os.path.relpath(path, self.root_path)
+        if relative.startswith("..") or not should_index(relative):
+            return
+        self.dirty.add(path)
+        if self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(1.0, self._flush_dirty)
+
+    def _flush_dirty(self):
+        self.flush_handle = None
+        paths, self.dirty = self.dirty, set()
+        task = asyncio.ensure_future(asyncio.to_thread(self.update_paths, paths))
+        task.add_done_callback(self._log_flush_error)
+
+    def _log_flush_error(self, task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"[!] Code index update failed: {task.exception()!r}")
+
+    def _ensure_ready(self):
+        if not self.ready:
+            self.refresh()
+
+    # --- queries ---
+    def _snippet(self, relative_path: str, line: int, before: int = 1, after: int = 3) -> str:
+        try:
+            with open(os.path.join(self.root_path, relative_path), "r", encoding="utf-8", errors="replace") as f:
+                lines = f.read().split("\n")
+        except OSError:
+            return ""
+        first, last = max(1, line - before), min(len(lines), line + after)
+        return "\n".join(f"{n:>6}\t{lines[n - 1]}" for n in range(first, last + 1))
+
+    def find_symbol(self, name: str, kind: str = None, limit: int = 10) -> str:
+        """Definitions of `name` (exact, then prefix/substring matches), each with a snippet and its reference count."""
+        with self.lock:
+            self._ensure_ready()
+            conn = self._connect()
+            kind_filter, params = ("AND kind = ?", [kind]) if kind else ("", [])
+            rows = conn.execute(
+                f"SELECT path, name, kind, line, end_line, parent, signature FROM symbols "
+                f"WHERE name LIKE ? ESCAPE '\\' {kind_filter} "
+                f"ORDER BY (name = ?) DESC, (name LIKE ? ESCAPE '\\') DESC, length(name), path LIMIT ?",
+                [f"%{like_escape(name)}%", *params, name, f"{like_escape(name)}%", limit]
+            ).fetchall()
+            ref_counts = {
+                n: c for n, c in conn.execute(
+                    f"SELECT name, COUNT(*) FROM refs WHERE name IN ({','.join('?' * len(rows))}) GROUP BY name",
+                    [r[1] for r in rows]
+                )
+            } if rows else {}
+            exact_refs = conn.execute(
+                "SELECT path, line FROM refs WHERE name = ? ORDER BY path, line LIMIT 15", (name,)
+            ).fetchall()
+
+        if not rows:
+            return f"Nenhum símbolo encontrado para '{name}'."
+        results = []
+        for path, symbol, symbol_kind, line, end_line, parent, signature in rows:
+            qualified = f"{parent}.{symbol}" if parent else symbol
+            header = f"{path}:{line}-{end_line} [{symbol_kind}] {qualified} — {ref_counts.get(symbol, 0)} referências\n  {signature}"
+            results.append(f"{header}\n{self._snippet(path, line)}")
+        if exact_refs:
+            results.append("Referências de '" + name + "': " + ", ".join(f"{p}:{l}" for p, l in exact_refs))
+        return "\n\n".join(results)
+
+    def search_code(self, query: str, limit: int = 10, path_glob: str = None) -> str:
+        """Full-text search over the workspace, bm25-ranked, returning numbered snippets around each hit."""
+        with self.lock:
+            self._ensure_ready()
+            conn = self._connect()
+            # The glob is applied in SQL, before the LIMIT, so other paths can't crowd out its hits
+            path_filter, path_params = ("AND path GLOB ?", [path_glob]) if path_glob else ("", [])
+            if len(query) >= 3:
+                rows = conn.execute(
+                    f"SELECT path, start_line, body FROM chunks WHERE chunks MATCH ? {path_filter} ORDER BY bm25(chunks) LIMIT ?",
+                    ['"' + query.replace('"', '""') + '"', *path_params, limit * 4]
+                ).fetchall()
+            else:
+                # Trigram MATCH needs at least three characters
+                rows = conn.execute(
+                    f"SELECT path, start_line, body FROM chunks WHERE body LIKE ? ESCAPE '\\' {path_filter} LIMIT ?",
+                    [f"%{like_escape(query)}%", *path_params, limit * 4]
+                ).fetchall()
+
+        needle = query.lower()
+        results = []
+        for path, start_line, body in rows:
+            chunk_lines = body.split("\n")
+            hits = [i for i, text in enumerate(chunk_lines) if needle in text.lower()]
+            if not hits:
+                continue
+            line = int(start_line) + hits[0]
+            extra = f" (+{len(hits) - 1} no mesmo trecho)" if len(hits) > 1 else ""
+            results.append(f"{path}:{line}{extra}\n{self._snippet(path, line, before=2, after=2)}")
+            if len(results) >= limit:
+                break
+        return "\n\n".join(results) if results else f"Nenhum resultado para '{query}'."
+
+    def stats(self) -> dict:
+        """Cached counters only: safe to call from the event loop while a refresh holds the lock."""
+        if self.conn is None:
+            return {"ready": False}
+        return {"ready": self.ready, **self.counts, "pending": len(self.dirty)}
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
@@ -1,67 +1,59 @@
-import subprocess
 import os
 import json
+from tools.process import ProcessRunner
+from tools.sandbox_pool import SandboxPool
 
 class DevToolkit:
-    def __init__(self, root_path: str):
+    def __init__(self, root_path: str, runner: ProcessRunner = None, sandbox_pool: SandboxPool = None):
         self.root_path = root_path
+        self.runner = runner or ProcessRunner()
+        self.sandbox_pool = sandbox_pool or SandboxPool()
 
-    def run_command(self, cmd: list) -> str:
+    async def run_command(self, cmd: list, timeout: float = 30) -> str:
         try:
-            result = subprocess.run(
-                cmd,
-                cwd=self.root_path,
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            return f"STDOUT:\n{result.stdout}\nSTDERR:\n{result.stderr}\nCode: {result.returncode}"
+            result = await self.runner.run(cmd, cwd=self.root_path, timeout=timeout)
+            notes = "".join(f"\n[... {n} bytes of {name} truncated]" for name, n in result.truncated.items() if n)
+            if result.timed_out:
+                notes += f"\nError: timed out after {timeout:.0f} seconds."
+            return f"STDOUT:\n{result.stdout}\nSTDERR:\n{result.stderr}\nCode: {result.returncode}{notes}"
         except Exception as e:
             return f"Error: {str(e)}"
 
-    def check_lint(self, path: str) -> str:
+    async def check_lint(self, path: str) -> str:
         """Executa flake8 no caminho especificado."""
         # Tenta usar flake8 se disponível
-        return self.run_command(["flake8", path])
+        return await self.run_command(["flake8", path])
 
-    def format_code(self, path: str) -> str:
+    async def format_code(self, path: str) -> str:
         """Executa black no caminho especificado."""
-        return self.run_command(["black", path])
+        return await self.run_command(["black", path])
 
-    def get_git_status(self) -> str:
+    async def get_git_status(self) -> str:
         """Retorna o status atual do repositório git."""
-        return self.run_command(["git", "status"])
+        return await self.run_command(["git", "status"])
 
-    def git_commit(self, message: str) -> str:
+    async def git_commit(self, message: str) -> str:
         """Realiza git add . e git commit."""
-        self.run_command(["git", "add", "."])
-        return self.run_command(["git", "commit", "-m", message])
+        await self.run_command(["git", "add", "."])
+        return await self.run_command(["git", "commit", "-m", message])
 
-    def docker_ps(self) -> str:
+    async def docker_ps(self) -> str:
         """Lista containers docker ativos."""
-        return self.run_command(["docker", "ps", "--format", "table {{.Names}}\t{{.Status}}\t{{.Ports}}"])
+        return await self.run_command(["docker", "ps", "--format", "table {{.Names}}\t{{.Status}}\t{{.Ports}}"])
 
-    def docker_logs(self, container_name: str) -> str:
+    async def docker_logs(self, container_name: str) -> str:
         """Pega os últimos logs de um container."""
-        return self.run_command(["docker", "logs", "--tail", "50", container_name])
+        return await self.run_command(["docker", "logs", "--tail", "50", container_name])
 
-    def run_python_sandbox(self, code: str) -> str:
-        """Executa código Python em um container isolado para testes e auto-aprimoramento."""
-        import uuid
-        temp_file = f"/tmp/sandbox_{uuid.uuid4().hex}.py"
+    async def run_python_sandbox(self, code: str) -> str:
+        """Executa código Python no sandbox (pool aquecido; isolado só no modo docker) para testes e auto-aprimoramento."""
         try:
-            with open(temp_file, "w") as f:
-                f.write(code)
-            
-            # Executa usando docker run --rm
-            # Mapeia o arquivo temporário para dentro do container
-            cmd = [
-                "docker", "run", "--rm",
-                "-v", f"{temp_file}:/app/script.py",
-                "python:3.11-slim",
-                "python", "/app/script.py"
-            ]
-            return self.run_command(cmd)
-        finally:
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
+            result = await self.sandbox_pool.run(code)
+        except Exception as e:
+            return f"Error: {str(e)}"
+        if "error" in result:
+            return f"Error: {result['error']}"
+        notes = "".join(f"\n[... {n} bytes of {name} truncated]" for name, n in result["truncated"].items() if n)
+        if result["timed_out"]:
+            notes += f"\nError: timed out after {self.sandbox_pool.timeout:.0f} seconds."
+        return f"STDOUT:\n{result['stdout']}\nSTDERR:\n{result['stderr']}\nCode: {result['returncode']}{notes}"
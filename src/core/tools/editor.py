@@ -1,38 +1,272 @@
 import os
+import re
+import mmap
+import bisect
+import asyncio
+import tempfile
+import threading
+from array import array
+from collections import OrderedDict
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+class PatchError(Exception):
+    pass
 
 class EditorTool:
-    def __init__(self, root_path: str):
+    """
+    File tools for the agent. Disk I/O runs in worker threads so it never blocks the event loop.
+    Ranged reads and searches go through mmap plus a cached line-offset index, and patches are
+    applied in memory and swapped in with an atomic rename, so work scales with the edit size.
+    """
+    def __init__(self, root_path: str, index_cache_size: int = 32):
         self.root_path = root_path
+        self.index_cache_size = index_cache_size
+        self.line_indexes = OrderedDict() # path -> ((mtime_ns, size), array of line start offsets)
+        self.lock = threading.Lock()
 
-    def read_file(self, file_path: str) -> str:
+    async def read_file(self, file_path: str) -> str:
         """Reads the content of a file."""
         full_path = self._get_full_path(file_path)
         try:
-            with open(full_path, 'r', encoding='utf-8') as f:
-                return f.read()
+            return await asyncio.to_thread(self._read, full_path)
         except Exception as e:
             return f"Error reading file: {str(e)}"
 
-    def write_file(self, file_path: str, content: str) -> str:
+    async def write_file(self, file_path: str, content: str) -> str:
         """Writes content to a file, overwriting existing content."""
         full_path = self._get_full_path(file_path)
         try:
-            os.makedirs(os.path.dirname(full_path), exist_ok=True)
-            with open(full_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+            await asyncio.to_thread(self._write, full_path, content)
             return f"Successfully wrote to {file_path}"
         except Exception as e:
             return f"Error writing file: {str(e)}"
 
-    def list_files(self, directory: str = ".") -> str:
+    async def list_files(self, directory: str = ".") -> str:
         """Lists files in a directory."""
         full_path = self._get_full_path(directory)
         try:
-            files = os.listdir(full_path)
+            files = await asyncio.to_thread(os.listdir, full_path)
             return "\n".join(files)
         except Exception as e:
             return f"Error listing files: {str(e)}"
 
+    async def read_range(self, file_path: str, start_line: int = 1, end_line: int = None, max_lines: int = 200) -> str:
+        """Reads a 1-based inclusive line range, numbered like `cat -n`."""
+        full_path = self._get_full_path(file_path)
+        try:
+            return await asyncio.to_thread(self._read_range, full_path, start_line, end_line, max_lines)
+        except Exception as e:
+            return f"Error reading file: {str(e)}"
+
+    async def read_bytes(self, file_path: str, offset: int = 0, length: int = 4096) -> str:
+        """Reads `length` bytes starting at `offset` (decoded as UTF-8, invalid bytes replaced)."""
+        full_path = self._get_full_path(file_path)
+        try:
+            return await asyncio.to_thread(self._read_bytes, full_path, offset, length)
+        except Exception as e:
+            return f"Error reading file: {str(e)}"
+
+    async def search(self, file_path: str, pattern: str, context: int = 2, max_matches: int = 20, ignore_case: bool = False) -> str:
+        """Regex search returning numbered windows of `context` lines around each match."""
+        full_path = self._get_full_path(file_path)
+        try:
+            return await asyncio.to_thread(self._search, full_path, pattern, context, max_matches, ignore_case)
+        except re.error as e:
+            return f"Error: invalid regex: {str(e)}"
+        except Exception as e:
+            return f"Error searching file: {str(e)}"
+
+    async def apply_patch(self, file_path: str, diff: str) -> str:
+        """Applies a unified diff to one file; all hunks apply or nothing is written."""
+        full_path = self._get_full_path(file_path)
+        try:
+            summary = await asyncio.to_thread(self._apply_patch, full_path, diff)
+            return f"Successfully patched {file_path} ({summary})"
+        except PatchError as e:
+            return f"Error applying patch: {str(e)}"
+        except Exception as e:
+            return f"Error writing file: {str(e)}"
+
+    def _line_index(self, full_path: str, mm) -> array:
+        st = os.stat(full_path)
+        key = (st.st_mtime_ns, st.st_size)
+        with self.lock:
+            cached = self.line_indexes.get(full_path)
+            if cached and cached[0] == key:
+                self.line_indexes.move_to_end(full_path)
+                return cached[1]
+
+        offsets = array("Q", [0])
+        position = mm.find(b"\n")
+        while position != -1:
+            offsets.append(position + 1)
+            position = mm.find(b"\n", position + 1)
+        if offsets[-1] == len(mm) and len(offsets) > 1:
+            offsets.pop() # trailing newline doesn't start another line
+
+        with self.lock:
+            self.line_indexes[full_path] = (key, offsets)
+            self.line_indexes.move_to_end(full_path)
+            while len(self.line_indexes) > self.index_cache_size:
+                self.line_indexes.popitem(last=False)
+        return offsets
+
+    def _line_text(self, mm, offsets: array, line: int) -> str:
+        start = offsets[line]
+        end = offsets[line + 1] if line + 1 < len(offsets) else len(mm)
+        return mm[start:end].decode("utf-8", errors="replace").rstrip("\r\n")
+
+    def _read_range(self, full_path: str, start_line: int, end_line: int, max_lines: int) -> str:
+        with open(full_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return "[empty file]"
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                offsets = self._line_index(full_path, mm)
+                total = len(offsets)
+                first = max(1, start_line)
+                last = min(total, end_line or total, first + max_lines - 1)
+                if first > total:
+                    return f"[file has only {total} lines]"
+                body = "\n".join(f"{n:>6}\t{self._line_text(mm, offsets, n - 1)}" for n in range(first, last + 1))
+                return f"[lines {first}-{last} of {total}]\n{body}"
+
+    def _read_bytes(self, full_path: str, offset: int, length: int) -> str:
+        with open(full_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0 or offset >= size:
+                return f"[offset {offset} is past the end of the file ({size} bytes)]"
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                chunk = mm[max(0, offset):max(0, offset) + length]
+                return f"[bytes {offset}-{offset + len(chunk)} of {size}]\n{chunk.decode('utf-8', errors='replace')}"
+
+    def _search(self, full_path: str, pattern: str, context: int, max_matches: int, ignore_case: bool) -> str:
+        regex = re.compile(pattern.encode(), re.IGNORECASE | re.MULTILINE if ignore_case else re.MULTILINE)
+        with open(full_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return "[no matches]"
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                offsets = self._line_index(full_path, mm)
+                windows, matches, last_shown = [], 0, -1
+                for match in regex.finditer(mm):
+                    line = bisect.bisect_right(offsets, match.start()) - 1
+                    if line <= last_shown:
+                        continue # already inside the previous window
+                    matches += 1
+                    if matches > max_matches:
+                        windows.append(f"[... stopped after {max_matches} matches]")
+                        break
+                    first, last = max(0, line - context), min(len(offsets) - 1, line + context)
+                    windows.append("\n".join(
+                        f"{n + 1:>6}{'>' if n == line else ' '}\t{self._line_text(mm, offsets, n)}" for n in range(first, last + 1)
+                    ))
+                    last_shown = last
+                return "\n--\n".join(windows) if windows else "[no matches]"
+
+    def _apply_patch(self, full_path: str, diff: str) -> str:
+        text = ""
+        if os.path.exists(full_path):
+            # newline="" keeps \r\n intact so CRLF files are written back as CRLF
+            with open(full_path, "r", encoding="utf-8", newline="") as f:
+                text = f.read()
+        newline = "\r\n" if "\r\n" in text[:4096] else "\n"
+        trailing_newline = text.endswith(newline) or not text
+        lines = text.split(newline)
+        if text.endswith(newline) or not text:
+            lines.pop()
+
+        result, hunks, offset, cursor = list(lines), 0, 0, 0
+        diff_lines = diff.splitlines()
+        i = 0
+        while i < len(diff_lines):
+            # Outside a hunk: file headers ("--- a/x", "+++ b/x"), blank lines and noise are skipped
+            header = HUNK_HEADER.match(diff_lines[i])
+            i += 1
+            if not header:
+                continue
+            hunks += 1
+            old_count = int(header.group(2)) if header.group(2) is not None else 1
+            new_count = int(header.group(4)) if header.group(4) is not None else 1
+            old_block, new_block, last_tag = [], [], None
+            # The header's line counts decide where the hunk ends, so a removed "-- x"
+            # (shown as "--- x") or a blank context line can't be mistaken for a delimiter
+            while i < len(diff_lines) and (len(old_block) < old_count or len(new_block) < new_count or diff_lines[i].startswith("\\")):
+                line = diff_lines[i]
+                i += 1
+                if line.startswith("\\"):
+                    # "\ No newline at end of file" refers to the line just before it
+                    if last_tag in ("+", " "):
+                        trailing_newline = False
+                    elif last_tag == "-":
+                        trailing_newline = True
+                    continue
+                tag, content = (line[0], line[1:]) if line else (" ", "")
+                if tag not in " -+":
+                    raise PatchError(f"hunk {hunks} (@@ -{header.group(1)}) has an invalid line: {line[:60]!r}")
+                if tag in " -":
+                    old_block.append(content)
+                if tag in " +":
+                    new_block.append(content)
+                last_tag = tag
+            if len(old_block) != old_count or len(new_block) != new_count:
+                raise PatchError(
+                    f"hunk {hunks} (@@ -{header.group(1)}) is truncated: expected {old_count}/{new_count} "
+                    f"old/new lines, got {len(old_block)}/{len(new_block)}"
+                )
+
+            expected = max(0, int(header.group(1)) - 1 + offset) if old_block else max(0, int(header.group(1)) + offset)
+            position = self._locate(result, old_block, expected, cursor)
+            if position is None:
+                raise PatchError(f"hunk {hunks} (@@ -{header.group(1)}) does not match the file contents")
+            result[position:position + len(old_block)] = new_block
+            offset += len(new_block) - len(old_block)
+            cursor = position + len(new_block)
+
+        if not hunks:
+            raise PatchError("no hunks found (expected a unified diff with @@ headers)")
+
+        content = newline.join(result) + (newline if trailing_newline and result else "")
+        self._atomic_write(full_path, content)
+        return f"{hunks} hunk(s), {len(lines)} -> {len(result)} lines"
+
+    def _locate(self, lines: list, block: list, expected: int, cursor: int):
+        """Exact position of `block`, searching outward from where the hunk header says it is."""
+        if not block:
+            return min(expected, len(lines))
+        size = len(block)
+        for distance in range(len(lines) + 1):
+            for position in (expected - distance, expected + distance) if distance else (expected,):
+                if cursor <= position <= len(lines) - size and lines[position:position + size] == block:
+                    return position
+        return None
+
+    def _atomic_write(self, full_path: str, content: str):
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        mode = os.stat(full_path).st_mode & 0o7777 if os.path.exists(full_path) else None
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".patch_")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            if mode is not None:
+                os.chmod(temp_path, mode)
+            os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _read(self, full_path: str) -> str:
+        with open(full_path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def _write(self, full_path: str, content: str):
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
     def _get_full_path(self, path: str) -> str:
         if os.path.isabs(path):
             return path
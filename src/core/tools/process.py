@@ -0,0 +1,128 @@
+import os
+import signal
+import asyncio
+
+class ProcessResult:
+    def __init__(self):
+        self.returncode = None
+        self.stdout = ""
+        self.stderr = ""
+        self.truncated = {"stdout": 0, "stderr": 0}
+        self.timed_out = False
+
+    def format(self) -> str:
+        """Same layout the terminal tool always returned, plus truncation notes."""
+        output = []
+        for name in ("stdout", "stderr"):
+            text = getattr(self, name)
+            if self.truncated[name]:
+                text += f"\n[... {self.truncated[name]} bytes truncated]"
+            if text:
+                output.append(f"--- {name.upper()} ---\n{text}")
+        output.append(f"--- EXIT CODE: {self.returncode} ---")
+        return "\n".join(output)
+
+class ProcessRunner:
+    """
+    Async subprocess execution shared by the terminal and dev tools.
+    Output is read incrementally and capped per stream, every process gets its own
+    process group so timeouts and cancellation kill the whole tree, and a semaphore
+    bounds how many tool processes run at once across all agents.
+    """
+    def __init__(self, max_concurrency: int = 8, max_output_bytes: int = 64000):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_output_bytes = max_output_bytes
+        self.semaphore = None
+        self.loop = None
+        self.running = 0
+        self.waiting = 0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self.semaphore is None or self.loop is not loop:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+            self.loop = loop
+        return self.semaphore
+
+    async def _pump(self, stream, result: ProcessResult, name: str, on_output):
+        kept = bytearray()
+        while True:
+            chunk = await stream.read(4096)
+            if not chunk:
+                break
+            if on_output:
+                on_output(name, chunk.decode(errors="replace"))
+            room = self.max_output_bytes - len(kept)
+            if room > 0:
+                kept += chunk[:room]
+            result.truncated[name] += max(0, len(chunk) - max(room, 0))
+        setattr(result, name, kept.decode(errors="replace"))
+
+    def _kill_group(self, process):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    async def run(self, command, cwd: str = None, timeout: float = 60, shell: bool = False,
+                  stdin: bytes = None, on_output=None, env: dict = None) -> ProcessResult:
+        """Runs `command` (a shell string if shell=True, else an argv list). on_output(stream, text) receives chunks live."""
+        semaphore = self._get_semaphore()
+        self.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.running += 1
+        result = ProcessResult()
+        process = None
+        try:
+            options = dict(
+                cwd=cwd, env=env, start_new_session=True,
+                stdin=asyncio.subprocess.PIPE if stdin is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            )
+            if shell:
+                process = await asyncio.create_subprocess_shell(command, **options)
+            else:
+                process = await asyncio.create_subprocess_exec(*command, **options)
+
+            if stdin is not None:
+                process.stdin.write(stdin)
+                await process.stdin.drain()
+                process.stdin.close()
+
+            # One deadline for the output and the exit: a command that closes its stdio early still times out
+            finished = asyncio.gather(
+                self._pump(process.stdout, result, "stdout", on_output),
+                self._pump(process.stderr, result, "stderr", on_output),
+                process.wait()
+            )
+            try:
+                await asyncio.wait_for(asyncio.shield(finished), timeout)
+            except asyncio.TimeoutError:
+                result.timed_out = True
+                self._kill_group(process)
+                try:
+                    # A process that escaped the group can keep the pipes open: don't wait on it forever
+                    await asyncio.wait_for(asyncio.shield(finished), 5)
+                except asyncio.TimeoutError:
+                    finished.cancel()
+                    await asyncio.wait({finished})
+                    if not finished.cancelled():
+                        finished.exception()
+            result.returncode = await process.wait()
+            return result
+        except asyncio.CancelledError:
+            # The agent run was cancelled (e.g. a hedged attempt lost): take the whole tree down
+            if process is not None:
+                self._kill_group(process)
+                await asyncio.shield(process.wait())
+            raise
+        finally:
+            self.running -= 1
+            semaphore.release()
+
+    def stats(self) -> dict:
+        return {"running": self.running, "waiting": self.waiting, "max_concurrency": self.max_concurrency}
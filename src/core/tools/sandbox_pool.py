@@ -0,0 +1,184 @@
+import os
+import sys
+import json
+import uuid
+import shutil
+import asyncio
+import logging
+from collections import deque
+
+logger = logging.getLogger("sandbox-pool")
+
+RUNNER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_runner.py")
+STREAM_LIMIT = 16 * 1024 * 1024
+
+class SandboxRunner:
+    """One pre-started zygote (a local process or a long-lived container)."""
+    def __init__(self, process, container: str = None):
+        self.process = process
+        self.container = container
+        self.runs = 0
+
+    async def call(self, request: dict) -> dict:
+        self.process.stdin.write((json.dumps(request) + "\n").encode())
+        await self.process.stdin.drain()
+        line = await self.process.stdout.readline()
+        if not line:
+            raise ConnectionResetError("sandbox runner exited")
+        self.runs += 1
+        return json.loads(line)
+
+    async def kill(self):
+        if self.container:
+            remover = await asyncio.create_subprocess_exec(
+                "docker", "rm", "-f", self.container,
+                stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+            )
+            await remover.wait()
+        if self.process.returncode is None:
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+            await self.process.wait()
+
+class SandboxPool:
+    """
+    Warm pool for the python_sandbox tool. Each runner is a zygote that forks a fresh
+    child per snippet, so state is reset between runs without paying interpreter or
+    container startup. Docker mode keeps the zygotes in long-lived containers (no network);
+    local mode runs them as plain subprocesses with rlimits, a scratch directory and a
+    scrubbed environment, for hosts without a docker daemon. Local mode is not isolation:
+    snippets can still read (and write) whatever the server's user can, and reach the network.
+    """
+    def __init__(self, mode: str = "auto", size: int = 2, timeout: float = 30.0, memory_mb: int = 256,
+                 cpu_seconds: int = 10, image: str = "python:3.11-slim", max_output: int = 64000):
+        self.requested_mode = mode
+        self.mode = None
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.cpu_seconds = cpu_seconds
+        self.image = image
+        self.max_output = max_output
+        self.idle = None
+        self.runners = set()
+        self.loop = None
+        self.start_lock = None
+        self.durations = deque(maxlen=200)
+        self.metrics = {"runs": 0, "reused": 0, "spawns": 0, "timeouts": 0, "failures": 0}
+
+    async def _docker_available(self) -> bool:
+        if not shutil.which("docker"):
+            return False
+        try:
+            probe = await asyncio.create_subprocess_exec(
+                "docker", "info", stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+            )
+            return await asyncio.wait_for(probe.wait(), 5) == 0
+        except (OSError, asyncio.TimeoutError):
+            return False
+
+    async def _spawn(self) -> SandboxRunner:
+        container = None
+        if self.mode == "docker":
+            container = f"ronaldinho-sandbox-{uuid.uuid4().hex[:12]}"
+            with open(RUNNER_SCRIPT) as f:
+                source = f.read()
+            argv = [
+                "docker", "run", "-i", "--rm", "--name", container, "--network", "none",
+                "--memory", f"{self.memory_mb * 2}m", "--cpus", "1", "--pids-limit", "64",
+                self.image, "python", "-u", "-c", source
+            ]
+            env = None
+        else:
+            argv = [sys.executable, "-u", RUNNER_SCRIPT]
+            # The server environment holds API keys: local runners start from an empty one
+            env = {"PATH": os.environ.get("PATH", "/usr/bin:/bin"), "PYTHONDONTWRITEBYTECODE": "1"}
+        process = await asyncio.create_subprocess_exec(
+            *argv, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            env=env, limit=STREAM_LIMIT
+        )
+        runner = SandboxRunner(process, container)
+        self.runners.add(runner)
+        self.metrics["spawns"] += 1
+        return runner
+
+    async def start(self):
+        """Picks the mode and pre-starts the runners on the running loop."""
+        loop = asyncio.get_running_loop()
+        if self.loop is loop and self.idle is not None:
+            return
+        if self.start_lock is None or self.loop is not loop:
+            self.start_lock = asyncio.Lock()
+        async with self.start_lock:
+            if self.loop is loop and self.idle is not None:
+                return
+            if self.mode is None:
+                self.mode = self.requested_mode
+                if self.mode == "auto":
+                    self.mode = "docker" if await self._docker_available() else "local"
+                    if self.mode == "local":
+                        logger.warning(
+                            "[!] SANDBOX_MODE=auto found no docker daemon: python_sandbox runs as a local "
+                            "subprocess that can read host files. Set SANDBOX_MODE=docker to require isolation."
+                        )
+            self.runners.clear()
+            self.loop = loop
+            self.idle = asyncio.Queue()
+            for _ in range(self.size):
+                self.idle.put_nowait(await self._spawn())
+            logger.info(f"[🧪] Sandbox pool ready ({self.mode} mode, {self.size} warm runners).")
+
+    async def _replace(self, runner: SandboxRunner):
+        self.runners.discard(runner)
+        await runner.kill()
+        self.idle.put_nowait(await self._spawn())
+
+    async def run(self, code: str) -> dict:
+        await self.start()
+        request = {
+            "code": code, "timeout": self.timeout, "memory_mb": self.memory_mb,
+            "cpu_seconds": self.cpu_seconds, "max_output": self.max_output
+        }
+        runner = await self.idle.get()
+        reused = runner.runs > 0
+        try:
+            # The runner enforces the timeout itself; the margin only catches a wedged zygote
+            response = await asyncio.wait_for(runner.call(request), self.timeout + 10)
+        except (asyncio.TimeoutError, ConnectionResetError, json.JSONDecodeError) as e:
+            self.metrics["failures"] += 1
+            logger.error(f"[!] Sandbox runner failed ({type(e).__name__}), respawning.")
+            await self._replace(runner)
+            return {"error": "o sandbox falhou ao executar o código"}
+        except asyncio.CancelledError:
+            asyncio.ensure_future(self._replace(runner))
+            raise
+
+        self.idle.put_nowait(runner)
+        self.metrics["runs"] += 1
+        self.metrics["reused"] += int(reused)
+        if response.get("timed_out"):
+            self.metrics["timeouts"] += 1
+        if "duration_ms" in response:
+            self.durations.append(response["duration_ms"])
+        return response
+
+    async def close(self):
+        for runner in list(self.runners):
+            await runner.kill()
+        self.runners.clear()
+        self.idle = None
+        self.loop = None
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode or "not started", # effective mode once auto has been resolved
+            "requested_mode": self.requested_mode,
+            "isolated": self.mode == "docker",
+            "runners": len(self.runners),
+            "idle": self.idle.qsize() if self.idle is not None else 0,
+            **self.metrics,
+            "reuse_rate": round(self.metrics["reused"] / self.metrics["runs"], 3) if self.metrics["runs"] else 0.0,
+            "avg_run_ms": round(sum(self.durations) / len(self.durations), 1) if self.durations else 0.0
+        }
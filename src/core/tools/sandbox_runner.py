@@ -0,0 +1,134 @@
+import os
+import sys
+import json
+import time
+import select
+import signal
+import shutil
+import resource
+import tempfile
+import traceback
+
+# Zygote for the python_sandbox tool. Kept dependency-free and self-contained: in docker
+# mode its source is passed to `python -c` inside the container.
+# Reads one JSON request per line on stdin, forks a fresh child per snippet (so no state
+# leaks between runs), applies rlimits in the child and answers one JSON line on stdout.
+
+# Warm the modules snippets use most, so forked children get them for free
+import re, math, random, itertools, functools, collections, datetime  # noqa: F401,E401
+
+def apply_limits(request: dict):
+    memory = request.get("memory_mb", 0) * 1024 * 1024
+    if memory > 0:
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    cpu = request.get("cpu_seconds", 0)
+    if cpu > 0:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    file_size = request.get("max_file_mb", 64) * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_FSIZE, (file_size, file_size))
+    resource.setrlimit(resource.RLIMIT_NOFILE, (256, 256))
+
+def run_child(request: dict, workdir: str, out_w: int, err_w: int):
+    status = 0
+    try:
+        os.setsid()
+        os.chdir(workdir)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(out_w, 1)
+        os.dup2(err_w, 2)
+        # Drop every other inherited descriptor, the zygote's protocol channel included
+        os.closerange(3, os.sysconf("SC_OPEN_MAX"))
+        os.environ.clear()
+        os.environ.update({"PATH": "/usr/local/bin:/usr/bin:/bin", "HOME": workdir, "TMPDIR": workdir})
+        sys.stdout = os.fdopen(1, "w", buffering=1)
+        sys.stderr = os.fdopen(2, "w", buffering=1)
+        sys.argv = ["script.py"]
+        apply_limits(request)
+        exec(compile(request["code"], "script.py", "exec"), {"__name__": "__main__"})
+    except SystemExit as e:
+        if isinstance(e.code, int):
+            status = e.code
+        elif e.code is not None:
+            print(e.code, file=sys.stderr)
+            status = 1
+    except BaseException:
+        # Skip the runner's own frame so the traceback starts at the snippet
+        etype, value, tb = sys.exc_info()
+        traceback.print_exception(etype, value, tb.tb_next)
+        status = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(status)
+
+def run(request: dict) -> dict:
+    workdir = tempfile.mkdtemp(prefix="sandbox_")
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    started = time.monotonic()
+    pid = os.fork()
+    if pid == 0:
+        os.close(out_r)
+        os.close(err_r)
+        run_child(request, workdir, out_w, err_w)
+    os.close(out_w)
+    os.close(err_w)
+
+    max_output = request.get("max_output", 64000)
+    buffers = {out_r: bytearray(), err_r: bytearray()}
+    truncated = {out_r: 0, err_r: 0}
+    deadline = started + request.get("timeout", 30)
+    timed_out = False
+    open_fds = [out_r, err_r]
+    while open_fds:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            timed_out = True
+            break
+        ready, _, _ = select.select(open_fds, [], [], remaining)
+        for fd in ready:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                open_fds.remove(fd)
+                continue
+            room = max_output - len(buffers[fd])
+            buffers[fd] += chunk[:max(room, 0)]
+            truncated[fd] += max(0, len(chunk) - max(room, 0))
+
+    if timed_out:
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            os.kill(pid, signal.SIGKILL)
+    _, status = os.waitpid(pid, 0)
+    for fd in (out_r, err_r):
+        os.close(fd)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "stdout": buffers[out_r].decode(errors="replace"),
+        "stderr": buffers[err_r].decode(errors="replace"),
+        "returncode": os.waitstatus_to_exitcode(status),
+        "truncated": {"stdout": truncated[out_r], "stderr": truncated[err_r]},
+        "timed_out": timed_out,
+        "duration_ms": round((time.monotonic() - started) * 1000, 1)
+    }
+
+def main():
+    # Keep the protocol channel private from anything the zygote itself might print
+    channel = os.fdopen(os.dup(1), "w", buffering=1)
+    os.dup2(2, 1)
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            response = run(json.loads(line))
+        except Exception as e:
+            response = {"error": f"{type(e).__name__}: {e}"}
+        channel.write(json.dumps(response) + "\n")
+
+if __name__ == "__main__":
+    main()
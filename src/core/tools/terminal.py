@@ -1,33 +1,22 @@
-import subprocess
-import os
+from tools.process import ProcessRunner
 
 class TerminalTool:
-    def __init__(self, root_path: str):
+    def __init__(self, root_path: str, runner: ProcessRunner = None):
         self.root_path = root_path
+        self.runner = runner or ProcessRunner()
 
-    def execute(self, command: str) -> str:
+    async def execute(self, command: str, timeout: float = 60, on_output=None) -> str:
         """Executes a shell command and returns structured feedback."""
         try:
-            result = subprocess.run(
+            result = await self.runner.run(
                 command,
                 shell=True,
                 cwd=self.root_path,
-                capture_output=True,
-                text=True,
-                timeout=60 # Increased timeout for complex builds
+                timeout=timeout, # Increased timeout for complex builds
+                on_output=on_output
             )
-            
-            output = []
-            if result.stdout:
-                output.append(f"--- STDOUT ---\n{result.stdout}")
-            if result.stderr:
-                output.append(f"--- STDERR ---\n{result.stderr}")
-            
-            status = f"--- EXIT CODE: {result.returncode} ---"
-            output.append(status)
-            
-            return "\n".join(output) if output else "[Command completed with no output]"
-        except subprocess.TimeoutExpired:
-            return "Error: Command timed out after 60 seconds."
+            if result.timed_out:
+                return f"{result.format()}\nError: Command timed out after {timeout:.0f} seconds."
+            return result.format()
         except Exception as e:
             return f"Error executing command: {str(e)}"
@@ -3,6 +3,8 @@ import logging
 import os
 import time
 from datetime import datetime
+from config import settings
+from benchmarker import get_latencies
 
 logger = logging.getLogger("neural-heartbeat")
 
@@ -11,12 +13,16 @@ class NeuralHeartbeat:
     Proactive background worker.
     Inspired by OpenClaw's heartbeat system.
     """
-    def __init__(self, interval=60):
+    def __init__(self, interval=60, router=None):
         self.interval = interval
+        self.router = router # Receives periodic provider probes (benchmarker) when set
+        self.last_benchmark = None
         self.is_running = False
+        self.task = None
 
     async def start(self):
         self.is_running = True
+        self.task = asyncio.current_task()
         logger.info("[*] Neural Heartbeat started (Proactive Mode).")
         
         while self.is_running:
@@ -44,12 +50,20 @@ class NeuralHeartbeat:
             if time.time() - mod_time > 3600 * 24: # 24h
                  logger.warning("[!] Ghost Session might be stale. Consider refreshing.")
 
-        # 3. Proactive Evolution Scan
+        # 3. Provider Benchmarks (feed the adaptive router)
+        due = self.last_benchmark is None or time.monotonic() - self.last_benchmark >= settings.ROUTER_BENCHMARK_INTERVAL
+        if self.router and settings.ENABLE_BENCHMARKING and due:
+            self.last_benchmark = time.monotonic()
+            self.router.update_probes(await get_latencies(integrity=settings.ROUTER_PROBE_INTEGRITY))
+
+        # 4. Proactive Evolution Scan
         # (Could check for new files or errors to fix)
         # logger.debug("[*] Heartbeat: Pulse OK.")
 
     def stop(self):
         self.is_running = False
+        if self.task and not self.task.done():
+            self.task.cancel() # Don't wait out the current sleep
 
 if __name__ == "__main__":
     # Log configuration